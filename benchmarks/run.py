@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from dataclasses import asdict, fields
+from pathlib import Path
+from shutil import rmtree
+import typing as t
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, ROOT.as_posix())
+
+from benchmarks.synthetic import SyntheticSiteSpec, generate_site  # noqa: E402
+
+BENCHMARKS: dict[str, t.Callable[[Path, int], list[float]]] = {}
+STARTUP_BUDGETS = {
+    "cli_startup": 0.25,
+    "cli_startup_build": 0.75,
+}
+
+
+def benchmark(name: str):
+
+    def wrapper(fn):
+        BENCHMARKS[name] = fn
+        return fn
+
+    return wrapper
+
+
+def measure(fn: t.Callable[[], t.Any],
+            repeat: int,
+            setup: t.Optional[t.Callable[[], t.Any]] = None) -> list[float]:
+    timings = []
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _clean_output(site: Path, bytecode=True):
+
+    def setup():
+        rmtree(site / "output", ignore_errors=True)
+        if bytecode:
+            rmtree(site / ".sitegen-cache", ignore_errors=True)
+        sys.modules.pop("overrides", None)
+
+    return setup
+
+
+@benchmark("content_load")
+def bench_content_load(site: Path, repeat: int):
+    from sitegen.loaders.content import ContentPathLoader
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        loader = ContentPathLoader(site / "content")
+    return measure(loader.load, repeat)
+
+
+@benchmark("content_load_snapshot")
+def bench_content_load_snapshot(site: Path, repeat: int):
+    from sitegen.loaders.content import ContentPathLoader
+    snapshot_dir = site / ".sitegen-cache" / "content"
+    rmtree(snapshot_dir, ignore_errors=True)
+    ContentPathLoader(site / "content", snapshot_dir=snapshot_dir)
+    return measure(
+        lambda: ContentPathLoader(site / "content", snapshot_dir=snapshot_dir),
+        repeat)
+
+
+@benchmark("content_load_lazy_single_page")
+def bench_content_load_lazy(site: Path, repeat: int):
+    from sitegen.loaders.content import ContentPathLoader
+
+    def run():
+        loader = ContentPathLoader(site / "content", lazy=True)
+        loader["page_00000"]
+
+    return measure(run, repeat)
+
+
+def _page_keypaths(site: Path) -> list[str]:
+    return sorted(p.stem for p in (site / "content").glob("page_*.toml"))
+
+
+@benchmark("content_lookup_benedict")
+def bench_content_lookup_benedict(site: Path, repeat: int):
+    from sitegen.loaders.content import ContentPathLoader
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        tree = ContentPathLoader(site / "content")._inner
+    keypaths = _page_keypaths(site)
+
+    def run():
+        for _ in range(10):
+            for keypath in keypaths:
+                result = tree[keypath]
+                result["__globals__"] = tree.get("__globals__", {})
+
+    return measure(run, repeat)
+
+
+@benchmark("content_lookup_index")
+def bench_content_lookup_index(site: Path, repeat: int):
+    from sitegen.loaders.content import ContentPathLoader
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        loader = ContentPathLoader(site / "content")
+    keypaths = _page_keypaths(site)
+
+    def run():
+        for _ in range(10):
+            for keypath in keypaths:
+                loader[keypath]
+
+    return measure(run, repeat)
+
+
+@benchmark("build_cold")
+def bench_build_cold(site: Path, repeat: int):
+    from sitegen.build import ProjectRenderer
+    return measure(lambda: ProjectRenderer(site).build(), repeat,
+                   _clean_output(site))
+
+
+@benchmark("build_warm_bytecode")
+def bench_build_warm(site: Path, repeat: int):
+    from sitegen.build import ProjectRenderer
+    _clean_output(site)()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        ProjectRenderer(site).build()
+    return measure(lambda: ProjectRenderer(site).build(), repeat,
+                   _clean_output(site, bytecode=False))
+
+
+@benchmark("build_incremental_noop")
+def bench_build_incremental(site: Path, repeat: int):
+    from sitegen.build import ProjectRenderer
+    _clean_output(site)()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        ProjectRenderer(site, incremental=True).build()
+    return measure(lambda: ProjectRenderer(site, incremental=True).build(),
+                   repeat)
+
+
+@benchmark("devserver_startup")
+def bench_devserver_startup(site: Path, repeat: int):
+    from sitegen.devserver import DevServer
+    return measure(lambda: DevServer("benchmark", project_root=site), repeat,
+                   lambda: sys.modules.pop("overrides", None))
+
+
+def _measure_process(argv: list[str], repeat: int) -> list[float]:
+    return measure(
+        lambda: subprocess.run([sys.executable, *argv],
+                               cwd=ROOT,
+                               stdout=subprocess.DEVNULL,
+                               check=True), repeat)
+
+
+@benchmark("cli_startup")
+def bench_cli_startup(site: Path, repeat: int):
+    return _measure_process(["cli.py", "--help"], repeat)
+
+
+@benchmark("cli_startup_build")
+def bench_cli_startup_build(site: Path, repeat: int):
+    return _measure_process(["-c", "import cli, sitegen.build"], repeat)
+
+
+def summarize(timings: list[float]) -> dict:
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+        "runs": len(timings),
+    }
+
+
+def git_revision() -> t.Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(spec: SyntheticSiteSpec, names: list[str], repeat: int,
+        workdir: Path) -> dict:
+    site = generate_site(workdir / "site", spec)
+    results = {}
+    for name in names:
+        logging.info(f"Running {name}")
+        results[name] = summarize(BENCHMARKS[name](site, repeat))
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "repeat": repeat,
+            "spec": asdict(spec),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    ok = True
+    print(f"{'benchmark':<28}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<28}{'-':>12}{result['median']:>12.4f}{'-':>8}")
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else 0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:<28}{old['median']:>12.4f}{result['median']:>12.4f}"
+              f"{ratio:>8.2f}{flag}")
+    return ok
+
+
+def check_budgets(current: dict, scale: float) -> bool:
+    ok = True
+    for name, budget in STARTUP_BUDGETS.items():
+        result = current["results"].get(name)
+        if result is None:
+            continue
+        limit = budget * scale
+        if result["median"] > limit:
+            print(f"{name} took {result['median']:.4f}s, "
+                  f"over the {limit:.4f}s budget")
+            ok = False
+    return ok
+
+
+def main():
+    parser = ArgumentParser(description="Run sitegen benchmarks")
+    parser.add_argument("--benchmark",
+                        "-b",
+                        action="append",
+                        choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", "-r", type=int, default=5)
+    parser.add_argument("--output", "-o", help="write JSON results here")
+    parser.add_argument("--compare", "-c", help="baseline JSON to compare")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--workdir", help="where to generate the site")
+    parser.add_argument("--budget-scale",
+                        type=float,
+                        default=1.0,
+                        help="multiply the startup budgets")
+    for field in fields(SyntheticSiteSpec):
+        parser.add_argument(f"--{field.name.replace('_', '-')}",
+                            type=int,
+                            default=field.default)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    spec = SyntheticSiteSpec(
+        **{f.name: getattr(args, f.name)
+           for f in fields(SyntheticSiteSpec)})
+    names = args.benchmark or list(BENCHMARKS)
+    if args.workdir is not None:
+        result = run(spec, names, args.repeat, Path(args.workdir))
+    else:
+        with tempfile.TemporaryDirectory(prefix="sitegen-bench-") as d:
+            result = run(spec, names, args.repeat, Path(d))
+
+    output = json.dumps(result, indent=2)
+    if args.output is not None:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+    ok = check_budgets(result, args.budget_scale)
+    if args.compare is not None:
+        baseline = json.loads(Path(args.compare).read_text())
+        ok = compare(baseline, result, args.threshold) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
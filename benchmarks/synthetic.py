@@ -0,0 +1,158 @@
+import random
+from argparse import ArgumentParser
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from shutil import rmtree
+
+BOILERPLATE = [
+    "## About\n\nThis page is part of a **synthetic** benchmark project.",
+    "> Built with sitegen. See the [source](https://example.com) for details.",
+    "- one\n- two\n- three\n\n`inline code` and *emphasis*",
+]
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do "
+         "eiusmod tempor incididunt ut labore et dolore magna aliqua").split()
+
+BASE_TEMPLATE = """<!DOCTYPE html>
+<html>
+  <head>
+    <meta charset="utf-8" />
+    <title>{{ title }}</title>
+    <link rel="stylesheet" href="/static/css/site.css" />
+  </head>
+  <body>
+    {% include "_nav.html.jinja" %}
+    <main>{% block main %}{% endblock %}</main>
+    <footer>{{ __globals__.footer }}</footer>
+  </body>
+</html>
+"""
+
+NAV_TEMPLATE = """<nav>
+  {% for link in __globals__.nav %}<a href="{{ link.url }}">{{ link.name }}</a>
+  {% endfor %}
+</nav>
+"""
+
+PAGE_TEMPLATE = """{% extends "_base.html.jinja" %}
+{% block main %}
+  <h1>{{ title }}</h1>
+  {% for block in blocks %}
+    <section>{% markdown %}{{ block }}{% endmarkdown %}</section>
+  {% endfor %}
+  <ul>
+  {% for item in items %}
+    <li>{{ item.name }}: {{ item.value }}</li>
+  {% endfor %}
+  </ul>
+{% endblock %}
+"""
+
+OVERRIDES = """from sitegen import ConfigOverrider
+
+
+def sitegen_overrides(cfg: ConfigOverrider):
+    return cfg
+"""
+
+
+@dataclass
+class SyntheticSiteSpec:
+    pages: int = 100
+    markdown_blocks: int = 10
+    items: int = 20
+    archive_years: int = 5
+    archive_entries: int = 50
+    static_files: int = 50
+    static_size: int = 16 * 1024
+    seed: int = 0
+
+
+def _sentence(rng: random.Random, n: int):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _toml_str(value: str):
+    return '"""' + value.replace('"""', '\\"""') + '"""'
+
+
+def _write_page_content(path: Path, index: int, spec: SyntheticSiteSpec,
+                        rng: random.Random):
+    lines = [f'title = "Page {index}"']
+    blocks = []
+    for i in range(spec.markdown_blocks):
+        if i % 3 == 0:
+            blocks.append(BOILERPLATE[i % len(BOILERPLATE)])
+        else:
+            blocks.append(f"### {_sentence(rng, 4)}\n\n{_sentence(rng, 40)}")
+    lines.append("blocks = [" + ", ".join(_toml_str(b) for b in blocks) + "]")
+    for i in range(spec.items):
+        lines.append("[[items]]")
+        lines.append(f'name = "item {i}"')
+        lines.append(f'value = "{_sentence(rng, 6)}"')
+    path.write_text("\n".join(lines) + "\n")
+
+
+def generate_site(root: Path, spec: SyntheticSiteSpec) -> Path:
+    rng = random.Random(spec.seed)
+    root = Path(root)
+    if root.exists():
+        rmtree(root)
+    templates = root / "templates"
+    content = root / "content"
+    static = root / "static"
+    for d in (templates, content, static / "css", static / "assets"):
+        d.mkdir(parents=True, exist_ok=True)
+
+    (root / "config.toml").write_text('[general]\n'
+                                      'template_dir = "templates"\n'
+                                      'output_dir = "output"\n'
+                                      'static_dir = "static"\n'
+                                      'content = "content"\n\n'
+                                      '[deploy]\n'
+                                      'branch = "gh-pages"\n')
+    (root / "overrides.py").write_text(OVERRIDES)
+    (templates / "_base.html.jinja").write_text(BASE_TEMPLATE)
+    (templates / "_nav.html.jinja").write_text(NAV_TEMPLATE)
+
+    nav = "\n".join(f'[[nav]]\nname = "Page {i}"\nurl = "/page_{i:05d}"'
+                    for i in range(min(spec.pages, 10)))
+    footer = f'footer = "Synthetic site, {spec.pages} pages"'
+    (content / "__globals__.toml").write_text(f"{footer}\n{nav}\n")
+
+    for i in range(spec.pages):
+        name = f"page_{i:05d}"
+        (templates / f"{name}.html.jinja").write_text(PAGE_TEMPLATE)
+        _write_page_content(content / f"{name}.toml", i, spec, rng)
+
+    for year in range(spec.archive_years):
+        year_dir = content / "archive" / f"y{2000 + year}"
+        year_dir.mkdir(parents=True, exist_ok=True)
+        for month in range(1, 13):
+            entries = "\n".join(f'[[entries]]\ntitle = "{_sentence(rng, 5)}"\n'
+                                f'summary = "{_sentence(rng, 20)}"'
+                                for _ in range(spec.archive_entries))
+            (year_dir / f"m{month:02d}.toml").write_text(entries + "\n")
+
+    (static / "css" / "site.css").write_text("body { margin: 0 auto; }\n" * 64)
+    for i in range(spec.static_files):
+        (static / "assets" / f"asset_{i:05d}.bin").write_bytes(
+            rng.randbytes(spec.static_size))
+    return root
+
+
+def main():
+    parser = ArgumentParser(description="Generate a synthetic sitegen site")
+    parser.add_argument("output")
+    for field, default in asdict(SyntheticSiteSpec()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}",
+                            type=int,
+                            default=default)
+    args = vars(parser.parse_args())
+    root = Path(args.pop("output"))
+    generate_site(root, SyntheticSiteSpec(**args))
+    print(f"Generated synthetic site in {root}")
+
+
+if __name__ == "__main__":
+    main()
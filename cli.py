@@ -1,55 +1,238 @@
+import time
+
+_START = time.perf_counter()
+
 from argparse import ArgumentParser
-from sitegen.devserver import FileWatcher
-from watchdog.observers import Observer
-from rich.logging import RichHandler
 from pathlib import Path
-from sitegen.config import Config
 import logging
+import sys
 
 
 def parse_args():
     parser = ArgumentParser()
     parser.add_argument("--project_root", "-p", default=".")
     parser.add_argument("--verbose", "-v", action="store_true")
+    parser.add_argument("--timings", action="store_true")
     subparser = parser.add_subparsers(dest="command")
     # dev
     dev_parser = subparser.add_parser("dev")
     dev_parser.add_argument("--port", "-P", default=8000)
     dev_parser.add_argument("--addr", "-A", default="0.0.0.0")
+    dev_parser.add_argument("--hot-reload", "-H", action="store_true")
+    dev_parser.add_argument("--async",
+                            "-a",
+                            dest="async_server",
+                            action="store_true")
     # build
     build_parser = subparser.add_parser("build")
+    build_parser.add_argument("--incremental", "-i", action="store_true")
+    build_parser.add_argument("--jobs", "-j", type=int, default=1)
+    build_parser.add_argument("--stream",
+                              dest="stream_output",
+                              action="store_const",
+                              const=True)
+    build_parser.add_argument("--precompress",
+                              action="store_const",
+                              const=True)
+    build_parser.add_argument("--minify", action="store_const", const=True)
+    build_parser.add_argument("--profile", action="store_true")
+    build_parser.add_argument("--profile-top", type=int, default=10)
+    build_parser.add_argument("--trace", help="write a Chrome trace file")
+    build_parser.add_argument("--watch", "-w", action="store_true")
+    build_parser.add_argument("--notify", action="store_true")
+    build_parser.add_argument("--ws-port", type=int, default=8088)
+    # deploy
+    deploy_parser = subparser.add_parser("deploy")
+    deploy_parser.add_argument("--branch", "-b")
+    deploy_parser.add_argument("--repo")
+    deploy_parser.add_argument("--remote")
+    deploy_parser.add_argument("--message", "-m")
+    # cache
+    cache_parser = subparser.add_parser("cache")
+    cache_subparser = cache_parser.add_subparsers(dest="cache_command")
+    cache_subparser.add_parser("clear")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+    return args
+
+
+def build_overrides(args):
+    keys = ["stream_output", "precompress", "minify"]
+    return {
+        key: getattr(args, key)
+        for key in keys if getattr(args, key) is not None
+    }
+
+
+class StartupTimings(object):
+
+    def __init__(self, start: float):
+        self._start = start
+        self._last = start
+        self.phases: list[tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        lines = [
+            f"{phase:<10}{seconds * 1000:>10.1f} ms"
+            for phase, seconds in self.phases
+        ]
+        total = self._last - self._start
+        lines.append(f"{'total':<10}{total * 1000:>10.1f} ms")
+        print("\n".join(lines), file=sys.stderr)
+
+
+def setup_logging(verbose: bool):
+    from rich.logging import RichHandler
+    level = logging.DEBUG if verbose else logging.INFO
+    logging.basicConfig(handlers=[RichHandler()], level=level)
+
 
-    return parser.parse_args()
+async def run_dev(args, timings: StartupTimings):
+    from sitegen.devserver import FileWatcher
+    from watchdog.observers import Observer
+    timings.mark("imports")
+    dev_server = FileWatcher(
+        project_root=Path(args.project_root),
+        port=args.port,
+        addr=args.addr,
+        hot_reload=args.hot_reload,
+        async_server=args.async_server,
+    )
+    observer = Observer()
+    observer.schedule(dev_server, path=args.project_root, recursive=True)
+    observer.start()
+    timings.mark("startup")
+    try:
+        await dev_server._ws_server._server_task
+    except KeyboardInterrupt:
+        observer.stop()
+        dev_server.terminate()
+    observer.join()
 
 
-async def main(args):
+async def run_watch(args, timings: StartupTimings):
+    import asyncio as aio
+    from sitegen.watch import BuildWatcher
+    from watchdog.observers import Observer
+    notifier = None
+    if args.notify:
+        from sitegen.devserver import WebSocketNotifier
+        notifier = WebSocketNotifier(args.ws_port)
+        notifier.run_in_background()
+    timings.mark("imports")
+    watcher = BuildWatcher(Path(args.project_root),
+                           jobs=args.jobs,
+                           build_overrides=build_overrides(args),
+                           notifier=notifier)
+    observer = Observer()
+    observer.schedule(watcher, path=args.project_root, recursive=True)
+    observer.start()
+    timings.mark("startup")
+    logging.info(f"Watching {args.project_root} for changes")
+    try:
+        await aio.Event().wait()
+    finally:
+        observer.stop()
+        watcher.terminate()
+        observer.join()
+
+
+def run_build(args, timings: StartupTimings):
+    from sitegen.build import ProjectRenderer
+    from sitegen.profiling import BuildProfiler, set_profiler
+    timings.mark("imports")
+    profiler = None
+    if args.profile or args.trace:
+        profiler = BuildProfiler()
+        set_profiler(profiler)
+    renderer = ProjectRenderer(Path(args.project_root),
+                               incremental=args.incremental,
+                               jobs=args.jobs,
+                               build_overrides=build_overrides(args))
+    timings.mark("startup")
+    renderer.build()
+    timings.mark("build")
+    if profiler is not None:
+        if args.profile:
+            profiler.print_report(top=args.profile_top)
+        if args.trace:
+            profiler.write_chrome_trace(args.trace)
+            logging.info(f"Wrote trace to {args.trace}")
+
+
+def run_deploy(args, timings: StartupTimings):
+    from sitegen.cache import get_cache_dir
+    from sitegen.config import Config
+    from sitegen.deploy import DeployError, GitDeployer
+    timings.mark("imports")
     project_root = Path(args.project_root)
-    if args.verbose:
-        logging.basicConfig(handlers=[RichHandler()], level=logging.DEBUG)
-    else:
-        logging.basicConfig(handlers=[RichHandler()], level=logging.INFO)
+    config = Config.from_toml(project_root / "config.toml")
+    deploy = config.deploy.copy(
+        update={
+            key: getattr(args, key)
+            for key in ["branch", "repo", "remote", "message"]
+            if getattr(args, key) is not None
+        })
+    deployer = GitDeployer(project_root / config.general.output_dir,
+                           repo=project_root / deploy.repo,
+                           branch=deploy.branch,
+                           message=deploy.message,
+                           remote=deploy.remote,
+                           cache_path=get_cache_dir(project_root, config) /
+                           "deploy.json")
+    try:
+        deployer.deploy()
+    except DeployError as e:
+        logging.error(f"Deploy failed: {e}")
+        sys.exit(1)
+    timings.mark("deploy")
+
+
+def run_cache(args, timings: StartupTimings):
+    from sitegen.cache import clear_cache
+    from sitegen.config import Config
+    timings.mark("imports")
+    project_root = Path(args.project_root)
+    if args.cache_command == "clear":
+        config = Config.from_toml(project_root / "config.toml")
+        if clear_cache(project_root, config):
+            logging.info(f"Cleared cache in {config.general.cache_dir}")
+        else:
+            logging.info("No cache to clear")
+    timings.mark("run")
+
+
+def main(args):
+    timings = StartupTimings(_START)
+    timings.mark("cli")
+    setup_logging(args.verbose)
+    timings.mark("logging")
     logging.debug(f"Project Root: {args.project_root}")
-    if args.command == "dev":
-        dev_server = FileWatcher(
-            project_root=project_root,
-            port=args.port,
-            addr=args.addr,
-        )
-        observer = Observer()
-        observer.schedule(dev_server, path=args.project_root, recursive=True)
-        observer.start()
-        try:
-            await dev_server._ws_server._server_task
-        except KeyboardInterrupt:
-            observer.stop()
-            dev_server.terminate()
-        observer.join()
-    if args.command == "build":
-        from sitegen.build import ProjectRenderer
-        renderer = ProjectRenderer(project_root)
-        renderer.build()
+    try:
+        if args.command == "dev":
+            import asyncio as aio
+            aio.run(run_dev(args, timings))
+        elif args.command == "build" and args.watch:
+            import asyncio as aio
+            aio.run(run_watch(args, timings))
+        elif args.command == "build":
+            run_build(args, timings)
+        elif args.command == "deploy":
+            run_deploy(args, timings)
+        elif args.command == "cache":
+            run_cache(args, timings)
+    finally:
+        if args.timings:
+            timings.report()
 
 
 if __name__ == "__main__":
-    import asyncio as aio
-    aio.run(main(parse_args()))
\ No newline at end of file
+    main(parse_args())
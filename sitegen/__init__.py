@@ -1 +1,5 @@
-from .extensions import ConfigOverrider
\ No newline at end of file
+def __getattr__(name):
+    if name == "ConfigOverrider":
+        from .extensions import ConfigOverrider
+        return ConfigOverrider
+    raise AttributeError(f"module 'sitegen' has no attribute '{name}'")
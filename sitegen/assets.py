@@ -0,0 +1,105 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import typing as t
+
+from .utils import LoggerMixin, hash_file
+
+DIGEST_LENGTH = 12
+
+
+def fingerprint_name(rel: str, digest: str) -> str:
+    path = Path(rel)
+    name = f"{path.stem}.{digest[:DIGEST_LENGTH]}{path.suffix}"
+    return path.with_name(name).as_posix()
+
+
+class AssetFingerprinter(LoggerMixin):
+    MANIFEST_FILENAME = "asset-manifest.json"
+    CACHE_VERSION = 1
+
+    def __init__(self,
+                 static_dir: Path,
+                 cache_path: t.Optional[Path] = None,
+                 jobs: t.Optional[int] = None):
+        super().__init__(name="sitegen:AssetFingerprinter")
+        self._static_dir = Path(static_dir)
+        self._cache_path = cache_path
+        self._jobs = jobs
+        self._digests: dict[str, tuple[int, int, str]] = self._load_cache()
+        self.assets: dict[str, str] = {}
+        self.hashed = 0
+        self.cached = 0
+
+    def _load_cache(self) -> dict[str, tuple[int, int, str]]:
+        if self._cache_path is None or not self._cache_path.is_file():
+            return {}
+        try:
+            with open(self._cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.warning(f"Ignoring unreadable asset cache: {e}")
+            return {}
+        if data.get("version") != self.CACHE_VERSION:
+            return {}
+        return {
+            rel: tuple(entry)
+            for rel, entry in data.get("files", {}).items()
+        }
+
+    def _save_cache(self):
+        if self._cache_path is None:
+            return
+        self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": self.CACHE_VERSION, "files": self._digests}
+        with open(self._cache_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    def _walk(self) -> dict[str, os.stat_result]:
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(self._static_dir):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = Path(dirpath) / name
+                rel = path.relative_to(self._static_dir).as_posix()
+                files[rel] = path.stat()
+        return files
+
+    def scan(self) -> dict[str, str]:
+        files = self._walk() if self._static_dir.is_dir() else {}
+        digests = {}
+        pending = []
+        for rel, stat in files.items():
+            cached = self._digests.get(rel)
+            if cached is not None and cached[0] == stat.st_mtime_ns \
+                    and cached[1] == stat.st_size:
+                digests[rel] = cached
+            else:
+                pending.append((rel, stat))
+
+        if len(pending) > 0:
+            with ThreadPoolExecutor(max_workers=self._jobs) as pool:
+                results = pool.map(
+                    lambda rel: hash_file(self._static_dir / rel),
+                    [rel for rel, _ in pending])
+                for (rel, stat), digest in zip(pending, results):
+                    digests[rel] = (stat.st_mtime_ns, stat.st_size, digest)
+
+        changed = len(pending) > 0 or digests.keys() != self._digests.keys()
+        self.hashed = len(pending)
+        self.cached = len(digests) - len(pending)
+        self._digests = digests
+        self.assets = {
+            rel: fingerprint_name(rel, entry[2])
+            for rel, entry in sorted(digests.items())
+        }
+        if changed:
+            self._save_cache()
+        self.debug(f"Fingerprinted {len(self.assets)} assets: hashed "
+                   f"{self.hashed}, {self.cached} cached")
+        return self.assets
+
+    def manifest_bytes(self) -> bytes:
+        payload = json.dumps(self.assets, indent=2, sort_keys=True) + "\n"
+        return payload.encode("utf-8")
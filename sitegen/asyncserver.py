@@ -0,0 +1,197 @@
+import asyncio as aio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from http import HTTPStatus
+from io import BytesIO
+from urllib.parse import unquote_to_bytes
+import typing as t
+
+from .utils import LoggerMixin
+
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "transfer-encoding", "upgrade",
+    "proxy-connection"
+}
+
+
+def _parse_head(head: bytes):
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        return None
+    headers: dict[str, str] = {}
+    for line in lines[1:]:
+        if line == "":
+            continue
+        name, sep, value = line.partition(":")
+        if sep == "":
+            return None
+        name = name.strip().lower()
+        value = value.strip()
+        headers[name] = f"{headers[name]}, {value}" if name in headers \
+            else value
+    return method, target, version, headers
+
+
+def _status_line(version: str, code: int) -> bytes:
+    return f"{version} {code} {HTTPStatus(code).phrase}\r\n".encode("latin-1")
+
+
+class AsyncWSGIServer(LoggerMixin):
+
+    def __init__(self,
+                 app: t.Callable,
+                 addr: str = "127.0.0.1",
+                 port: int = 8000,
+                 workers: t.Optional[int] = None,
+                 keep_alive_timeout: float = 5.0):
+        super().__init__(name="sitegen:AsyncWSGIServer")
+        self._app = app
+        self._addr = addr
+        self._port = int(port)
+        self._keep_alive_timeout = keep_alive_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="sitegen-http")
+        self._server: t.Optional[aio.AbstractServer] = None
+        self._server_task: t.Optional[aio.Task] = None
+
+    async def _serve(self):
+        self._server = await aio.start_server(self._handle_connection,
+                                              self._addr, self._port)
+        async with self._server:
+            await self._server.serve_forever()
+
+    def run_in_background(self):
+        if self._server_task is not None:
+            raise RuntimeError("Server already running")
+        self._server_task = aio.create_task(self._serve())
+
+    async def run(self):
+        self.run_in_background()
+        await self._server_task
+
+    def terminate(self):
+        if self._server_task is not None:
+            self._server_task.cancel()
+            self._server_task = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        self._executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader: aio.StreamReader,
+                                 writer: aio.StreamWriter):
+        peer = writer.get_extra_info("peername") or ("", 0)
+        loop = aio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await aio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                              self._keep_alive_timeout)
+                except (aio.IncompleteReadError, aio.LimitOverrunError,
+                        aio.TimeoutError, ConnectionError):
+                    break
+                request = _parse_head(head)
+                if request is None:
+                    writer.write(
+                        _status_line("HTTP/1.1", 400) +
+                        b"Content-Length: 0\r\n"
+                        b"Connection: close\r\n\r\n")
+                    break
+                method, target, version, headers = request
+                length = int(headers.get("content-length", "0") or 0)
+                body = await reader.readexactly(length) if length > 0 \
+                    else b""
+                environ = self._environ(method, target, version, headers, body,
+                                        peer)
+                status, response_headers, payload = \
+                    await loop.run_in_executor(self._executor,
+                                               self._call_app, environ)
+                keep_alive = self._keep_alive(version, headers)
+                writer.write(
+                    self._encode_head(version, status, response_headers,
+                                      len(payload), keep_alive))
+                if method != "HEAD":
+                    writer.write(payload)
+                await writer.drain()
+                self.debug(f'"{method} {target} {version}" {status}')
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    def _keep_alive(version: str, headers: dict[str, str]) -> bool:
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @staticmethod
+    def _encode_head(version: str, status: str, headers: list[tuple[str, str]],
+                     length: int, keep_alive: bool) -> bytes:
+        lines = [f"{version} {status}"]
+        has_length = False
+        for name, value in headers:
+            lower = name.lower()
+            if lower in HOP_BY_HOP_HEADERS:
+                continue
+            has_length = has_length or lower == "content-length"
+            lines.append(f"{name}: {value}")
+        if not has_length:
+            lines.append(f"Content-Length: {length}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    def _environ(self, method: str, target: str, version: str,
+                 headers: dict[str, str], body: bytes, peer) -> dict:
+        path, _, query = target.partition("?")
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote_to_bytes(path).decode("latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": self._addr,
+            "SERVER_PORT": str(self._port),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": peer[0],
+            "REMOTE_PORT": str(peer[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace("-", "_")
+            if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                environ[key] = value
+            else:
+                environ[f"HTTP_{key}"] = value
+        return environ
+
+    def _call_app(self, environ: dict):
+        response = {}
+        body = []
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = status
+            response["headers"] = headers
+            return body.append
+
+        result = self._app(environ, start_response)
+        try:
+            for chunk in result:
+                body.append(chunk)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return response["status"], response["headers"], b"".join(body)
@@ -1,71 +1,352 @@
+from dataclasses import dataclass
 from os import PathLike
+from .assets import AssetFingerprinter
+from .cache import ProjectBytecodeCache, get_cache_dir
 from .config import Config
+from .events import ChangeBatch
 from . import ConfigOverrider
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pathlib import Path
-from .extensions.template import MarkdownRender, AutoRefreshListener
+from .extensions.template import (AssetResolver, AutoRefreshListener,
+                                  MarkdownRender)
+from .profiling import BuildProfiler, get_profiler, set_profiler
+from .routes import PageEntry, TemplateIndex
+from .manifest import BuildManifest, find_template_dependencies, hash_content
+from .static import StaticSync
+from .tracking import fingerprint, render_tracked
+from .writer import OutputChanges, OutputWriter
 import sys
 import importlib
-from .utils import LoggerMixin, build_keypath_from_relative_path
-from shutil import copy, copytree
+from .utils import LoggerMixin, hash_bytes, hash_file
+
+
+@dataclass
+class BuildStats:
+    rebuilt: int = 0
+    skipped: int = 0
+    copied: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    bytes_copied: int = 0
+    bytes_skipped: int = 0
+
+
+_worker_renderer: "ProjectRenderer | None" = None
+
+
+def _init_worker(project_dir: Path, build_overrides: dict, profile: bool,
+                 assets: dict[str, str]):
+    global _worker_renderer
+    set_profiler(BuildProfiler() if profile else None)
+    _worker_renderer = ProjectRenderer(project_dir,
+                                       build_overrides=build_overrides,
+                                       content_workers=1)
+    _worker_renderer.use_assets(assets)
+
+
+def _render_in_worker(entry: PageEntry):
+    profiler = get_profiler()
+    if profiler.enabled:
+        profiler.spans.clear()
+        profiler.counters.clear()
+    deps = _worker_renderer.render_page(entry)
+    changes = _worker_renderer.wait_for_writes()
+    _worker_renderer.log_markdown_cache_stats()
+    if profiler.enabled:
+        return entry, deps, changes, profiler.spans, dict(profiler.counters)
+    return entry, deps, changes, [], {}
+
+
+# general options that only change how content is loaded, not the output
+LOAD_ONLY_OPTIONS = {"content_workers", "content_snapshot"}
 
 
 class ProjectRenderer(LoggerMixin):
+    CHANGES_FILENAME = ".sitegen-changes.json"
 
-    def __init__(self, project_dir: PathLike):
+    def __init__(self,
+                 project_dir: PathLike,
+                 incremental: bool = False,
+                 jobs: int = 1,
+                 build_overrides: dict | None = None,
+                 content_workers: int | None = None):
         super().__init__(name="sitegen:build")
+        profiler = get_profiler()
         self._project_dir = project_dir if isinstance(
             project_dir, Path) else Path(project_dir)
-        self._config = Config.from_toml(self._project_dir / 'config.toml')
+        with profiler.span("config"):
+            self._config = Config.from_toml(self._project_dir / 'config.toml')
+        self._build_overrides = build_overrides or {}
+        self._config.build = self._config.build.copy(
+            update=self._build_overrides)
+        if content_workers is not None:
+            self._config.general = self._config.general.copy(
+                update={"content_workers": content_workers})
 
         self._output_dir = self._project_dir / self._config.general.output_dir
         self._output_dir.mkdir(parents=True, exist_ok=True)
-        self._content_loader = self._config.general.content_loader(
-            self._project_dir)
-        self._template_loader = FileSystemLoader(
-            self._project_dir / self._config.general.template_dir)
+        self._template_dir = (self._project_dir /
+                              self._config.general.template_dir)
+        with profiler.span("content_load"):
+            self._content_loader = self._config.general.content_loader(
+                self._project_dir)
+        self._template_loader = FileSystemLoader(self._template_dir)
         self._jinja_env = Environment(
             loader=self._template_loader,
-            extensions=[MarkdownRender, AutoRefreshListener],
+            extensions=[MarkdownRender, AutoRefreshListener, AssetResolver],
             autoescape=select_autoescape(['html', 'xml']),
+            bytecode_cache=ProjectBytecodeCache(self._project_dir,
+                                                self._config),
         )
-        self._merge_overrides()
-
-    def handle_templates_dir(self):
-        for template_path in self._template_loader.list_templates():
-            p = Path(template_path)
-            self.debug(f"Found file {template_path} in template dir")
-            if not p.name.startswith("_") and p.name.endswith(".jinja"):
-                self.info(f"Rendering {template_path}")
-                template = self._jinja_env.get_template(template_path)
-                keypath = build_keypath_from_relative_path(p)
-                content = self._content_loader[keypath]
-                rendered = template.render(**content)
-                output_path = self._output_dir / p
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                output_path = output_path.absolute().as_posix().removesuffix(
-                    ".jinja")
-                self.debug(f"Writing template to {output_path}")
-                with open(output_path, 'w') as f:
-                    f.write(rendered)
-            elif not p.name.startswith("_"):
-                src = p.absolute().as_posix()
-                dst = (self._output_dir / p).absolute()
-                dst.parent.mkdir(parents=True, exist_ok=True)
-                self.debug(f"Copying {src} to {dst}")
-                copy(src, dst.as_posix())
+        self._jinja_env.asset_prefix = "/" + self._config.general.static_dir
+        with profiler.span("overrides"):
+            self._merge_overrides()
+        self._writer = OutputWriter(self._output_dir,
+                                    precompress=self._config.build.precompress,
+                                    minify=self._config.build.minify)
+
+        self._incremental = incremental
+        self._force = False
+        self._jobs = max(1, jobs)
+        self._pending_pages: list[PageEntry] = []
+        self._template_index: TemplateIndex | None = None
+        self._assets: AssetFingerprinter | None = None
+        self._assets_digest: str | None = None
+        self._previous_manifest = BuildManifest.load(self._output_dir)
+        self._manifest = self._new_manifest()
+        if incremental and len(self._previous_manifest.pages) > 0 and \
+                self._previous_manifest.options != self._manifest.options:
+            self.info("Build options changed, rebuilding all pages")
+        self.stats = BuildStats()
+        self.changes = OutputChanges()
+
+    @property
+    def config(self) -> Config:
+        return self._config
+
+    def _new_manifest(self) -> BuildManifest:
+        options = {
+            "general": self._config.general.dict(exclude=LOAD_ONLY_OPTIONS),
+            "router": self._config.router.dict(),
+            "build": self._config.build.dict(),
+            "compressed": self._writer.compressed_suffixes,
+            "overrides": self._overrides_digest,
+        }
+        manifest = BuildManifest(self._output_dir)
+        manifest.options = hash_content(options)
+        return manifest
+
+    def handle_templates_dir(self, jobs: int | None = None):
+        with get_profiler().span("template_scan"):
+            self._template_index = TemplateIndex(self._template_dir,
+                                                 self._config.router.routes)
+        self._index_templates()
+        for name in self._template_index.files:
+            self.debug(f"Found file {name} in template dir")
+            self._copy_file(self._template_dir / name, Path(name))
+        for entry in self._template_index.pages:
+            self.debug(f"Found page {entry.output} ({entry.template})")
+            self._handle_page(entry)
+        self._render_pending_pages(jobs or self._jobs)
+        self.changes.merge(self.wait_for_writes())
+
+    def _render_pending_pages(self, jobs: int):
+        pending, self._pending_pages = self._pending_pages, []
+        if jobs == 1 or len(pending) <= 1:
+            for entry in pending:
+                self._record_page(entry, self.render_page(entry))
+        else:
+            import multiprocess as mp
+            processes = min(jobs, len(pending))
+            self.info(f"Rendering {len(pending)} pages with "
+                      f"{processes} workers")
+            with mp.Pool(processes=processes,
+                         initializer=_init_worker,
+                         initargs=(self._project_dir, self._build_overrides,
+                                   get_profiler().enabled,
+                                   self._jinja_env.asset_urls)) as pool:
+                for entry, deps, changes, spans, counters in \
+                        pool.imap_unordered(_render_in_worker, pending):
+                    self.debug(f"Worker finished {entry.output}")
+                    self._record_page(entry, deps)
+                    self.changes.merge(changes)
+                    if get_profiler().enabled:
+                        get_profiler().merge(spans, counters)
+        self.stats.rebuilt += len(pending)
+
+    def _index_templates(self):
+        with get_profiler().span("template_index"):
+            self._index_templates_unprofiled()
+
+    def _index_templates_unprofiled(self):
+        for template_path in self._template_index.templates:
+            source, _, _ = self._template_loader.get_source(
+                self._jinja_env, template_path)
+            self._manifest.templates[template_path] = {
+                "hash": hash_bytes(source.encode("utf-8")),
+                "deps": find_template_dependencies(self._jinja_env, source),
+            }
+
+    def _page_content(self, entry: PageEntry):
+        return self._content_loader[entry.keypath]
+
+    def _handle_page(self, entry: PageEntry):
+        if self._incremental and not self._force:
+            previous = self._previous_manifest.pages.get(entry.output)
+            if self._is_page_fresh(entry, previous):
+                self.debug(f"Skipping unchanged {entry.output}")
+                self._manifest.pages[entry.output] = previous
+                self.stats.skipped += 1
+                return
+        self._pending_pages.append(entry)
+
+    def _record_page(self, entry: PageEntry, deps: dict):
+        self._manifest.pages[entry.output] = {
+            "template": entry.template,
+            "templates": self._manifest.closure_hashes(entry.template),
+            "deps": deps,
+            "fingerprint": fingerprint(self._page_content(entry), deps),
+            "assets": self._assets_digest,
+        }
+
+    def render_page(self, entry: PageEntry) -> dict:
+        content = self._page_content(entry)
+        output_path = self._output_dir / entry.output
+
+        self.info(f"Rendering {entry.template}")
+        profiler = get_profiler()
+        with profiler.span(entry.output, category="page") as span:
+            markdown_before = self._markdown_blocks_rendered()
+            with profiler.span("template_compile", template=entry.template):
+                template = self._jinja_env.get_template(entry.template)
+            if self._config.build.stream_output:
+                chunks, deps = render_tracked(template, content, stream=True)
+            else:
+                with profiler.span("render", template=entry.template):
+                    chunks, deps = render_tracked(template, content)
+            self.debug(f"Writing template to {output_path}")
+            with profiler.span("write", template=entry.template):
+                written = self._writer.write(output_path, chunks)
+            profiler.count("pages_rendered")
+            profiler.count("bytes_written", written)
+            if span is not None:
+                span.args["bytes"] = written
+                span.args["markdown_blocks"] = (
+                    self._markdown_blocks_rendered() - markdown_before)
+        return deps.to_dict()
+
+    def wait_for_writes(self) -> OutputChanges:
+        with get_profiler().span("compress"):
+            return self._writer.take_changes()
+
+    def _markdown_blocks_rendered(self):
+        ext = MarkdownRender.from_environment(self._jinja_env)
+        return ext.hits + ext.misses if ext is not None else 0
+
+    def _is_page_fresh(self, entry: PageEntry, previous: dict | None) -> bool:
+        templates = self._manifest.closure_hashes(entry.template)
+        if previous is None or templates is None:
+            return False
+        if self._previous_manifest.options != self._manifest.options:
+            return False
+        if previous["templates"] != templates:
+            return False
+        if previous.get("assets") != self._assets_digest:
+            return False
+        if not (self._output_dir / entry.output).is_file():
+            return False
+        content = self._page_content(entry)
+        current = fingerprint(content, previous["deps"])
+        return current == previous["fingerprint"]
+
+    def _copy_file(self, src: Path, output_rel: Path):
+        dst = self._output_dir / output_rel
+        digest = hash_file(src)
+        key = output_rel.as_posix()
+        self._manifest.static[key] = digest
+        previous = self._previous_manifest.static.get(key)
+        if self._incremental and previous == digest and dst.is_file():
+            self.stats.unchanged += 1
+            return
+        self.debug(f"Copying {src} to {dst}")
+        if self._writer.copy_file(src, dst):
+            self.stats.copied += 1
+        else:
+            self.stats.unchanged += 1
+
+    def use_assets(self, assets: dict[str, str]):
+        self._jinja_env.asset_urls = assets
+        self._assets_digest = hash_content(assets) if len(assets) > 0 \
+            else None
+
+    def prepare_assets(self):
+        if not self._config.build.fingerprint_assets:
+            return
+        if self._assets is None:
+            cache_dir = get_cache_dir(self._project_dir, self._config)
+            self._assets = AssetFingerprinter(
+                self._project_dir / self._config.general.static_dir,
+                cache_path=cache_dir / "assets.json")
+        with get_profiler().span("asset_fingerprint"):
+            self.use_assets(self._assets.scan())
+        self.info(f"Fingerprinted {len(self._assets.assets)} assets, "
+                  f"hashed {self._assets.hashed}")
 
     def handle_static_dir(self):
         src = self._project_dir / self._config.general.static_dir
         dst = self._output_dir / self._config.general.static_dir
-        dst.parent.mkdir(parents=True, exist_ok=True)
-        self.debug(f"Copying static dir ('{src.as_posix()}') to {dst}")
-        copytree(src.as_posix(), dst.as_posix())
+        if not src.is_dir():
+            self.debug(f"No static dir found at {src}")
+            return
+        self.debug(f"Syncing static dir ('{src.as_posix()}') to {dst}")
+        sync = StaticSync(link_mode=self._config.build.static_link_mode)
+        with get_profiler().span("static_sync"):
+            result = sync.sync(src, dst, aliases=self._jinja_env.asset_urls)
+        for rel, change in sorted(result.changed.items()):
+            output_rel = f"{self._config.general.static_dir}/{rel}"
+            if change == "removed":
+                self.changes.remove(output_rel)
+            else:
+                self.changes.record(output_rel, existed=change == "modified")
+        if self._assets is not None:
+            manifest_path = self._output_dir / self._assets.MANIFEST_FILENAME
+            self._writer.write_bytes(manifest_path,
+                                     self._assets.manifest_bytes(),
+                                     precompress=False)
+            self.changes.merge(self._writer.take_changes())
+        get_profiler().count("bytes_written", result.bytes_copied)
+        self.stats.copied += result.copied
+        self.stats.unchanged += result.skipped
+        self.stats.removed += result.removed
+        self.stats.bytes_copied += result.bytes_copied
+        self.stats.bytes_skipped += result.bytes_skipped
+        self.info(f"Static files: copied {result.copied} "
+                  f"({result.bytes_copied} bytes), skipped {result.skipped} "
+                  f"({result.bytes_skipped} bytes), removed {result.removed}")
+
+    def remove_stale_outputs(self):
+        previous = set(self._previous_manifest.pages) | set(
+            self._previous_manifest.static)
+        current = set(self._manifest.pages) | set(self._manifest.static)
+        for rel in sorted(previous - current):
+            path = self._output_dir / rel
+            if path.is_file():
+                self.info(f"Removing stale output {rel}")
+                path.unlink()
+                self.stats.removed += 1
+                self.changes.remove(rel)
+            for suffix in (".gz", ".br"):
+                sibling = path.with_name(path.name + suffix)
+                if sibling.is_file():
+                    sibling.unlink()
+                    self.changes.remove(rel + suffix)
 
     def _merge_overrides(self):
         sys.path.insert(1, self._project_dir.as_posix())
+        self._overrides_digest = None
         try:
             overrides = importlib.import_module('overrides')
+            self._overrides_digest = hash_file(Path(overrides.__file__))
             overrider = ConfigOverrider()
             overrider: 'ConfigOverrider' = overrides.sitegen_overrides(
                 overrider)
@@ -73,6 +354,56 @@ class ProjectRenderer(LoggerMixin):
         except ModuleNotFoundError:
             self.info(f"No overrides found in {self._project_dir}")
 
-    def build(self):
-        self.handle_templates_dir()
+    def log_markdown_cache_stats(self):
+        ext = MarkdownRender.from_environment(self._jinja_env)
+        if ext is not None:
+            info = ext.cache_info()
+            self.debug(f"Markdown cache: {info['hits']} hits, "
+                       f"{info['misses']} misses, {info['size']} entries")
+
+    def _finish_build(self):
+        self.remove_stale_outputs()
+        self._manifest.save()
+        self.info(f"Rebuilt {self.stats.rebuilt} pages, skipped "
+                  f"{self.stats.skipped}; copied {self.stats.copied} files, "
+                  f"{self.stats.unchanged} unchanged, removed "
+                  f"{self.stats.removed} stale outputs")
+
+    def write_changes(self):
+        self.changes.save(self._output_dir / self.CHANGES_FILENAME)
+        self.info(f"Output changes: {len(self.changes.added)} added, "
+                  f"{len(self.changes.modified)} modified, "
+                  f"{len(self.changes.removed)} removed")
+
+    def build(self, force: bool = False):
+        self._force = force
+        profiler = get_profiler()
+        self.prepare_assets()
+        with profiler.span("templates"):
+            self.handle_templates_dir()
         self.handle_static_dir()
+        self.log_markdown_cache_stats()
+        self._finish_build()
+        self.write_changes()
+        self._force = False
+        return self.stats
+
+    def rebuild(self, batch: ChangeBatch):
+        if not self._incremental:
+            raise RuntimeError("rebuild() requires an incremental renderer")
+        for path in sorted(batch.paths["content"]):
+            self.debug(f"Reloading content from {path}")
+            self._content_loader.reload_file(Path(path))
+        self._previous_manifest = self._manifest
+        self._manifest = self._new_manifest()
+        self.stats = BuildStats()
+        self.changes = OutputChanges()
+        if "static" in batch:
+            self.prepare_assets()
+        with get_profiler().span("templates"):
+            self.handle_templates_dir(jobs=1)
+        if "static" in batch:
+            self.handle_static_dir()
+        self._finish_build()
+        self.write_changes()
+        return self.stats
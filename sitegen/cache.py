@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+from shutil import rmtree
+
+import jinja2
+from jinja2 import FileSystemBytecodeCache
+
+from .config import Config
+from .utils import LoggerMixin
+
+
+def get_cache_dir(project_root: Path, config: Config, *parts: str) -> Path:
+    cache_dir = Path(project_root) / config.general.cache_dir
+    for part in parts:
+        cache_dir = cache_dir / part
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+class ProjectBytecodeCache(FileSystemBytecodeCache, LoggerMixin):
+
+    def __init__(self, project_root: Path, config: Config):
+        python_tag = f"py{sys.version_info[0]}{sys.version_info[1]}"
+        directory = get_cache_dir(project_root, config, "jinja",
+                                  f"{jinja2.__version__}-{python_tag}")
+        FileSystemBytecodeCache.__init__(self, directory.as_posix())
+        LoggerMixin.__init__(self, name="sitegen:BytecodeCache")
+        self.debug(f"Using jinja bytecode cache at {directory}")
+
+
+def clear_cache(project_root: Path, config: Config):
+    cache_dir = Path(project_root) / config.general.cache_dir
+    if cache_dir.is_dir():
+        rmtree(cache_dir)
+        return True
+    return False
@@ -2,8 +2,6 @@ from pathlib import Path
 from pydantic import BaseModel
 from os import PathLike
 
-from sitegen.loaders.content import ContentMappingLoader, ContentPathLoader
-
 
 class ContentMapping(BaseModel):
     content: str
@@ -14,15 +12,27 @@ class GeneralConfig(BaseModel):
     template_dir: str = "templates"
     output_dir: str = "output"
     static_dir: str = "static"
+    cache_dir: str = ".sitegen-cache"
     content: str | ContentMapping = "content.toml"
+    lazy_content: bool = False
+    content_workers: int = 1
+    content_snapshot: bool = True
 
     def content_loader(self, project_root=Path('.')):
+        from sitegen.loaders.content import (ContentMappingLoader,
+                                             ContentPathLoader)
         if isinstance(self.content, str):
             p = project_root / Path(self.content)
             is_toml = p.suffix == ".toml"
             is_dir = p.is_dir()
             if is_dir or is_toml:
-                return ContentPathLoader(p)
+                snapshot_dir = None
+                if self.content_snapshot:
+                    snapshot_dir = project_root / self.cache_dir / "content"
+                return ContentPathLoader(p,
+                                         lazy=self.lazy_content,
+                                         workers=self.content_workers,
+                                         snapshot_dir=snapshot_dir)
             else:
                 raise ValueError(
                     f"Invalid content config: {self.content} is not a valid path"
@@ -37,6 +47,24 @@ class GeneralConfig(BaseModel):
 
 class DeployConfig(BaseModel):
     branch: str = "gh-pages"
+    repo: str = "."
+    remote: str | None = None
+    message: str = "Deploy site"
+
+
+class BuildConfig(BaseModel):
+    static_link_mode: str = "copy"
+    stream_output: bool = False
+    precompress: bool = False
+    minify: bool = False
+    fingerprint_assets: bool = False
+
+
+class DevConfig(BaseModel):
+    debounce: float = 0.2
+    ignore: list[str] = []
+    page_cache: bool = True
+    gzip: bool = False
 
 
 class Route(BaseModel):
@@ -56,6 +84,9 @@ class RouterConfig(BaseModel):
 class Config(BaseModel):
     general: GeneralConfig
     deploy: DeployConfig
+    build: BuildConfig = BuildConfig()
+    dev: DevConfig = DevConfig()
+    router: RouterConfig = RouterConfig()
 
     @classmethod
     def from_toml(cls, path: "PathLike") -> "Config":
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+import typing as t
+
+from .utils import LoggerMixin
+
+EXCLUDED_PREFIX = ".sitegen-"
+SYMLINK_MODE = "120000"
+
+
+class DeployError(RuntimeError):
+    pass
+
+
+def git_blob_hash(data: bytes, object_format: str = "sha1") -> str:
+    h = hashlib.new(object_format)
+    h.update(f"blob {len(data)}\0".encode("ascii"))
+    h.update(data)
+    return h.hexdigest()
+
+
+@dataclass
+class DeployResult:
+    commit: str
+    tree: str
+    files: int = 0
+    written: int = 0
+    reused: int = 0
+    changed: bool = True
+
+
+class GitDeployer(LoggerMixin):
+    CACHE_VERSION = 1
+
+    def __init__(self,
+                 output_dir: Path,
+                 repo: Path,
+                 branch: str,
+                 message: str = "Deploy site",
+                 remote: t.Optional[str] = None,
+                 cache_path: t.Optional[Path] = None):
+        super().__init__(name="sitegen:GitDeployer")
+        self._output_dir = Path(output_dir)
+        self._repo = Path(repo)
+        self._ref = f"refs/heads/{branch}"
+        self._message = message
+        self._remote = remote
+        self._cache_path = cache_path
+
+    def _git(self,
+             *args: str,
+             input: t.Optional[bytes] = None,
+             env: t.Optional[dict] = None,
+             check: bool = True) -> t.Optional[str]:
+        try:
+            result = subprocess.run(["git", *args],
+                                    cwd=self._repo,
+                                    input=input,
+                                    env=env,
+                                    capture_output=True)
+        except FileNotFoundError as e:
+            raise DeployError("git executable not found") from e
+        if result.returncode != 0:
+            if not check:
+                return None
+            stderr = result.stderr.decode(errors="replace").strip()
+            raise DeployError(f"git {args[0]} failed: {stderr}")
+        return result.stdout.decode()
+
+    def _load_cache(self, object_format: str) -> dict[str, list]:
+        if self._cache_path is None or not self._cache_path.is_file():
+            return {}
+        try:
+            with open(self._cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.warning(f"Ignoring unreadable deploy cache: {e}")
+            return {}
+        if data.get("version") != self.CACHE_VERSION or data.get(
+                "format") != object_format:
+            return {}
+        return data.get("files", {})
+
+    def _save_cache(self, object_format: str, files: dict[str, list]):
+        if self._cache_path is None:
+            return
+        self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.CACHE_VERSION,
+            "format": object_format,
+            "files": files,
+        }
+        with open(self._cache_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    def _walk(self) -> list[tuple[str, Path]]:
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self._output_dir):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = Path(dirpath) / name
+                rel = path.relative_to(self._output_dir).as_posix()
+                if rel.startswith(EXCLUDED_PREFIX):
+                    continue
+                files.append((rel, path))
+        return files
+
+    def _hash_files(self, object_format: str):
+        cache = self._load_cache(object_format)
+        entries = {}
+        for rel, path in self._walk():
+            stat = path.lstat()
+            if path.is_symlink():
+                mode = SYMLINK_MODE
+            elif stat.st_mode & 0o111:
+                mode = "100755"
+            else:
+                mode = "100644"
+            cached = cache.get(rel)
+            if cached is not None and cached[:3] == [
+                    stat.st_mtime_ns, stat.st_size, mode
+            ]:
+                entries[rel] = cached
+                continue
+            if mode == SYMLINK_MODE:
+                data = os.fsencode(os.readlink(path))
+            else:
+                data = path.read_bytes()
+            entries[rel] = [
+                stat.st_mtime_ns, stat.st_size, mode,
+                git_blob_hash(data, object_format)
+            ]
+        return entries
+
+    def _existing_tree(self, parent: t.Optional[str]) -> dict[str, str]:
+        if parent is None:
+            return {}
+        listing = self._git("ls-tree", "-r", "-z", "--full-tree", parent)
+        blobs = {}
+        for record in listing.split("\0"):
+            if record == "":
+                continue
+            info, path = record.split("\t", 1)
+            blobs[path] = info.split(" ")[2]
+        return blobs
+
+    def _missing_objects(self, shas: t.Iterable[str]) -> set[str]:
+        shas = sorted(set(shas))
+        if len(shas) == 0:
+            return set()
+        output = self._git("cat-file",
+                           "--batch-check",
+                           input="".join(f"{sha}\n"
+                                         for sha in shas).encode("ascii"))
+        missing = set()
+        for line in output.splitlines():
+            if line.endswith(" missing"):
+                missing.add(line.split(" ")[0])
+        return missing
+
+    def _write_objects(self, entries: dict[str, list], missing: set[str]):
+        paths = {}
+        for rel, entry in entries.items():
+            if entry[3] in missing and entry[3] not in paths:
+                paths[entry[3]] = rel
+        files = [(sha, rel) for sha, rel in paths.items()
+                 if entries[rel][2] != SYMLINK_MODE]
+        if len(files) > 0:
+            stdin = "".join(
+                f"{(self._output_dir / rel).resolve().as_posix()}\n"
+                for _, rel in files)
+            output = self._git("hash-object",
+                               "-w",
+                               "--no-filters",
+                               "--stdin-paths",
+                               input=stdin.encode("utf-8"))
+            for (sha, rel), written in zip(files, output.split()):
+                if sha != written:
+                    raise DeployError(f"{rel} changed while deploying")
+        for sha, rel in paths.items():
+            if entries[rel][2] == SYMLINK_MODE:
+                target = os.fsencode(os.readlink(self._output_dir / rel))
+                self._git("hash-object", "-w", "--stdin", input=target)
+        return len(paths)
+
+    def _write_tree(self, entries: dict[str, list]) -> str:
+        index_info = "".join(f"{entry[2]} {entry[3]}\t{rel}\0"
+                             for rel, entry in sorted(entries.items()))
+        with tempfile.TemporaryDirectory(prefix="sitegen-deploy-") as d:
+            env = {**os.environ, "GIT_INDEX_FILE": os.path.join(d, "index")}
+            self._git("update-index",
+                      "--add",
+                      "-z",
+                      "--index-info",
+                      input=index_info.encode("utf-8"),
+                      env=env)
+            return self._git("write-tree", env=env).strip()
+
+    def deploy(self) -> DeployResult:
+        if not self._output_dir.is_dir():
+            raise DeployError(f"Output dir {self._output_dir} does not exist,"
+                              " run the build first")
+        object_format = self._git("rev-parse", "--show-object-format").strip()
+        parent = self._git("rev-parse",
+                           "--verify",
+                           "-q",
+                           f"{self._ref}^{{commit}}",
+                           check=False)
+        parent = parent.strip() if parent is not None else None
+
+        entries = self._hash_files(object_format)
+        existing = self._existing_tree(parent)
+        reused = sum(1 for rel, entry in entries.items()
+                     if existing.get(rel) == entry[3])
+        new = [
+            entry[3] for rel, entry in entries.items()
+            if existing.get(rel) != entry[3]
+        ]
+        missing = self._missing_objects(new)
+        written = self._write_objects(entries, missing)
+        tree = self._write_tree(entries)
+        self._save_cache(object_format, entries)
+
+        if parent is not None and self._git(
+                "rev-parse", f"{parent}^{{tree}}").strip() == tree:
+            self.info(f"{self._ref} is already up to date")
+            result = DeployResult(parent, tree, len(entries), 0, reused, False)
+        else:
+            args = ["commit-tree", tree, "-m", self._message]
+            if parent is not None:
+                args += ["-p", parent]
+            commit = self._git(*args).strip()
+            self._git("update-ref", "-m", self._message, self._ref, commit,
+                      parent or "")
+            self.info(f"Deployed {len(entries)} files to {self._ref} "
+                      f"({commit[:12]}): {written} new objects, "
+                      f"{reused} reused")
+            result = DeployResult(commit, tree, len(entries), written, reused)
+        if self._remote is not None:
+            self._git("push", self._remote, f"{self._ref}:{self._ref}")
+            self.info(f"Pushed {self._ref} to {self._remote}")
+        return result
@@ -1,20 +1,40 @@
-from types import FunctionType
+import gzip
+import json
+import mimetypes
+from dataclasses import dataclass, field
 from flask.templating import Environment
+from jinja2 import TemplateSyntaxError
 from watchdog.events import FileSystemEventHandler
 
-from .extensions.template import AutoRefreshListener, MarkdownRender
+from .asyncserver import AsyncWSGIServer
+from .extensions.template import (AssetResolver, AutoRefreshListener,
+                                  MarkdownRender)
 
 from sitegen.extensions import ConfigOverrider
+from .cache import ProjectBytecodeCache
 from .config import Config
-from flask import Flask, render_template
+from .events import ChangeBatch, EventPipeline, PathClassifier
+from .loaders.index import GLOBALS_KEY
+from .manifest import DYNAMIC_DEPENDENCY, find_template_dependencies
+from .routes import PageEntry, TemplateIndex
+from flask import Flask, Response, abort, render_template, request
 import multiprocess as mp
 from pathlib import Path
 from websockets.server import serve, WebSocketServerProtocol
-from websockets import broadcast
+from websockets.exceptions import ConnectionClosed
 import asyncio as aio
-from .utils import LoggerMixin
+from .utils import LoggerMixin, hash_bytes
 import typing as t
 import os
+import sys
+import threading
+from werkzeug.serving import make_server
+
+GZIP_MIN_SIZE = 512
+GZIP_MIMETYPES = {
+    "application/javascript", "application/json", "application/xml",
+    "image/svg+xml"
+}
 
 
 class DevEnvironment(Environment):
@@ -26,24 +46,66 @@ class DevEnvironment(Environment):
             post_init_callback(self)
 
 
+@dataclass
+class PageUpdate:
+    reload_all: bool = False
+    pages: set[str] = field(default_factory=set)
+    stylesheets: set[str] = field(default_factory=set)
+
+    def merge(self, other: "PageUpdate"):
+        self.reload_all = self.reload_all or other.reload_all
+        self.pages |= other.pages
+        self.stylesheets |= other.stylesheets
+
+    def __bool__(self):
+        return self.reload_all or len(self.pages) > 0 or len(
+            self.stylesheets) > 0
+
+
+@dataclass
+class ClientInfo:
+    path: t.Optional[str] = None
+    legacy: bool = True
+
+
 class WebSocketNotifier(LoggerMixin):
+    COALESCE_DELAY = 0.05
 
-    def __init__(self, port, addr="0.0.0.0"):
+    def __init__(self,
+                 port,
+                 addr="0.0.0.0",
+                 resolve_page: t.Optional[t.Callable[[str],
+                                                     t.Optional[str]]] = None):
         super().__init__(name="sitgen:WebSocketNotifier")
         self._server = serve(self._register_conn, addr, port)
         self._addr = addr
         self._port = port
-        self._conns = set()
+        self._resolve_page = resolve_page
+        self._clients: dict[WebSocketServerProtocol, ClientInfo] = {}
 
         self._queue = aio.Queue()
         self._server_task = None
+        self._loop = None
 
     async def _register_conn(self, websocket: WebSocketServerProtocol):
-        self._conns.add(websocket)
+        self._clients[websocket] = ClientInfo()
         try:
-            await websocket.wait_closed()
+            async for message in websocket:
+                self._handle_message(websocket, message)
+        except ConnectionClosed:
+            pass
         finally:
-            self._conns.remove(websocket)
+            del self._clients[websocket]
+
+    def _handle_message(self, websocket: WebSocketServerProtocol, message):
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return
+        if isinstance(data, dict) and data.get("type") == "register":
+            self._clients[websocket] = ClientInfo(path=data.get("path"),
+                                                  legacy=False)
+            self.debug(f"Client registered for {data.get('path')}")
 
     async def _init_server(self):
         async with self._server:
@@ -51,10 +113,19 @@ class WebSocketNotifier(LoggerMixin):
                 f"WebSocketNotifier listening on ws://{self._addr}:{self._port}"
             )
 
-            await aio.Future()
+            await self._dispatch_updates()
+
+    async def _dispatch_updates(self):
+        while True:
+            update = await self._queue.get()
+            await aio.sleep(self.COALESCE_DELAY)
+            while not self._queue.empty():
+                update.merge(self._queue.get_nowait())
+            await self._broadcast(update)
 
     def run_in_background(self):
         if self._server_task is None:
+            self._loop = aio.get_running_loop()
             self._server_task = aio.create_task(self._init_server())
 
         else:
@@ -71,37 +142,97 @@ class WebSocketNotifier(LoggerMixin):
         if self._server_task is not None:
             self._server_task.cancel()
             self._server_task = None
-        self._server.shutdown()
 
-    def send_update_notification(self):
-        self.debug("Sending update notification")
-        broadcast(self._conns, "RELOAD")
+    def send_update_notification(self, update: t.Optional[PageUpdate] = None):
+        if update is None:
+            update = PageUpdate(reload_all=True)
+        if not update or self._loop is None:
+            return
+        if threading.current_thread() is not threading.main_thread():
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, update)
+        else:
+            self._queue.put_nowait(update)
+
+    def _message_for(self, client: ClientInfo,
+                     update: PageUpdate) -> t.Optional[str]:
+        if client.legacy:
+            return "RELOAD"
+        page = client.path
+        if self._resolve_page is not None and page is not None:
+            page = self._resolve_page(page)
+        if update.reload_all or (page is not None and page in update.pages):
+            return json.dumps({"type": "reload"})
+        if len(update.stylesheets) > 0:
+            return json.dumps({
+                "type": "stylesheets",
+                "paths": sorted(update.stylesheets)
+            })
+        return None
+
+    async def _broadcast(self, update: PageUpdate):
+        sends = []
+        for websocket, client in list(self._clients.items()):
+            message = self._message_for(client, update)
+            if message is not None:
+                sends.append(websocket.send(message))
+        self.debug(f"Sending update notification to {len(sends)} of "
+                   f"{len(self._clients)} clients")
+        await aio.gather(*sends, return_exceptions=True)
 
 
 class FileWatcher(FileSystemEventHandler, LoggerMixin):
 
     def __init__(
-            self,
-            project_root=Path("."),
-            port=8000,
-            addr="127.0.0.1",
-            ws_port=8088,
+        self,
+        project_root=Path("."),
+        port=8000,
+        addr="127.0.0.1",
+        ws_port=8088,
+        hot_reload=False,
+        async_server=False,
     ):
 
         super().__init__(name="sitgen:ProjectWatcher")
         self._port = port
         self._addr = addr
+        self._async_server = async_server
+        self._hot_reload = hot_reload or async_server
+        self._http_server = None
+        self._process = None
+        self._lock = threading.Lock()
         self._project_root = project_root if isinstance(
             project_root, Path) else Path(project_root)
         self._server = DevServer(__name__, project_root=self._project_root)
-        self._ws_server = WebSocketNotifier(ws_port)
+        self._pipeline = self._create_pipeline()
+        self._ws_server = WebSocketNotifier(ws_port,
+                                            resolve_page=self._resolve_page)
         self._ws_server.run_in_background()
         self.start_server()
 
+    def _create_pipeline(self):
+        config = self._server.project_config
+        return EventPipeline(
+            PathClassifier(self._project_root, config),
+            self._handle_batch,
+            debounce=config.dev.debounce,
+        )
+
     def terminate(self):
+        self._pipeline.cancel()
         self._ws_server.terminate()
         self.terminate_server()
 
+    def _handle_batch(self, batch: ChangeBatch):
+        self.info(f"Reloading after {batch.raw_events} file events "
+                  f"({batch.summary()})")
+        with self._lock:
+            if not self._hot_reload:
+                self._restart_server()
+            else:
+                self._reload_in_process(batch)
+            if "config" in batch:
+                self._pipeline = self._create_pipeline()
+
     def _restart_server(self):
         if self._process is not None:
             self.info("Restarting dev server")
@@ -111,9 +242,61 @@ class FileWatcher(FileSystemEventHandler, LoggerMixin):
         if self._process is not None:
             self._ws_server.send_update_notification()
 
+    def _reload_in_process(self, batch: ChangeBatch):
+        self._ws_server.send_update_notification(self._apply_batch(batch))
+
+    def _apply_batch(self, batch: ChangeBatch) -> PageUpdate:
+        templates = batch.paths["template"]
+        if "config" in batch:
+            self.info("Reloading dev server")
+            self._replace_app()
+            return PageUpdate(reload_all=True)
+        update = PageUpdate()
+        if any(self._server.routes_changed(p) for p in templates):
+            self._server.derive_routes_from_dir()
+            update.reload_all = True
+        for path in templates:
+            self._server.invalidate_template(path)
+        update.pages |= self._server.pages_using_templates(templates)
+        for path in batch.paths["content"]:
+            pages = self._server.reload_content(path)
+            if pages is None:
+                update.reload_all = True
+            else:
+                update.pages |= pages
+        for path in batch.paths["static"]:
+            if path.endswith(".css"):
+                update.stylesheets.add(self._server.static_url(path))
+            else:
+                update.reload_all = True
+        return update
+
+    def _resolve_page(self, url: str) -> t.Optional[str]:
+        return self._server.page_for_url(url)
+
+    def _replace_app(self):
+        sys.modules.pop("overrides", None)
+        self._server = DevServer(__name__, project_root=self._project_root)
+
+    def _dispatch(self, environ, start_response):
+        return self._server(environ, start_response)
+
     def start_server(self):
-        self._process = self._create_process()
-        self._process.start()
+        if self._async_server:
+            self._http_server = AsyncWSGIServer(self._dispatch, self._addr,
+                                                self._port)
+            self._http_server.run_in_background()
+        elif self._hot_reload:
+            self._http_server = make_server(self._addr,
+                                            int(self._port),
+                                            self._dispatch,
+                                            threaded=True)
+            self._process = threading.Thread(
+                target=self._http_server.serve_forever, daemon=True)
+        else:
+            self._process = self._create_process()
+        if self._process is not None:
+            self._process.start()
         self.info(f"Dev server istening on http://{self._addr}:{self._port}")
 
     def _create_process(self):
@@ -127,22 +310,30 @@ class FileWatcher(FileSystemEventHandler, LoggerMixin):
         )
 
     def terminate_server(self):
-        if self._process is not None:
-            self._process.terminate()
+        if isinstance(self._http_server, AsyncWSGIServer):
+            self._http_server.terminate()
+            self._http_server = None
+        elif self._process is not None:
+            if self._http_server is not None:
+                self._http_server.shutdown()
+                self._http_server.server_close()
+                self._http_server = None
+            else:
+                self._process.terminate()
             self._process.join()
             self._process = None
 
     def on_moved(self, event):
-        self._restart_server()
+        self._pipeline.push(event)
 
     def on_deleted(self, event):
-        self._restart_server()
+        self._pipeline.push(event)
 
     def on_modified(self, event):
-        self._restart_server()
+        self._pipeline.push(event)
 
     def on_created(self, event):
-        self._restart_server()
+        self._pipeline.push(event)
 
 
 class DevServer(Flask, LoggerMixin):
@@ -162,13 +353,14 @@ class DevServer(Flask, LoggerMixin):
     ):
         LoggerMixin.__init__(self, name="sitegen:DevServer")
         self.jinja_options['extensions'] = [
-            MarkdownRender, AutoRefreshListener
+            MarkdownRender, AutoRefreshListener, AssetResolver
         ]
-        self._project_root = Path(project_root) if not isinstance(
-            project_root, str) else project_root
+        self._project_root = Path(project_root)
         self._logger.debug(f"Using project root: {self._project_root}")
         self._project_config = Config.from_toml(self._project_root /
                                                 "config.toml")
+        self.jinja_options['bytecode_cache'] = ProjectBytecodeCache(
+            self._project_root, self._project_config)
         static_dir = self._project_root / Path(
             self._project_config.general.static_dir)
         template_dir = self._project_root / Path(
@@ -183,11 +375,18 @@ class DevServer(Flask, LoggerMixin):
         self._content_loader = self._project_config.general.content_loader(
             Path(self._project_root))
         self._content_loader.load()
+        self._template_index: TemplateIndex | None = None
+        self._template_deps: dict[str, tuple[int, set[str]]] = {}
+        self._content_fingerprints: t.Optional[dict[str, str]] = None
+        self._page_cache: dict[str, tuple[bytes, str]] = {}
+        self._gzip_cache: dict[str, bytes] = {}
+        self.after_request(self._finalize_response)
         self.derive_routes_from_dir()
         self._merge_overrides()
 
     def restart(self):
         self.content_loader.load()
+        self._content_fingerprints = None
         self.derive_routes_from_dir()
         self._merge_overrides()
 
@@ -201,27 +400,185 @@ class DevServer(Flask, LoggerMixin):
     def content_loader(self):
         return self._content_loader
 
+    @property
+    def project_config(self) -> Config:
+        return self._project_config
+
+    def _template_name(self, path: t.Union[str, os.PathLike]):
+        template_dir = Path(self.template_folder).resolve()
+        return Path(path).resolve().relative_to(template_dir).as_posix()
+
+    def routes_changed(self, path: t.Union[str, os.PathLike]):
+        p = Path(path)
+        return p.is_file() != self._template_index.has_template(
+            self._template_name(p))
+
+    def invalidate_template(self, path: t.Union[str, os.PathLike]):
+        name = self._template_name(path)
+        cache = self.jinja_env.cache
+        if cache is not None:
+            for key in list(cache.keys()):
+                if key[1] == name:
+                    del cache[key]
+        self.clear_response_cache()
+        self.info(f"Invalidated template '{name}'")
+
+    def reload_content(
+            self, path: t.Union[str, os.PathLike]) -> t.Optional[set[str]]:
+        self.info(f"Reloading content from '{path}'")
+        before = self._content_fingerprints or self._fingerprint_content()
+        self.content_loader.reload_file(Path(path))
+        self.clear_response_cache()
+        after = self._content_fingerprints = self._fingerprint_content()
+        if before is None or after is None or before.get(
+                GLOBALS_KEY) != after.get(GLOBALS_KEY):
+            return None
+        changed = {
+            keypath
+            for keypath in before.keys() | after.keys()
+            if before.get(keypath) != after.get(keypath)
+        }
+        outputs = set()
+        for entry in self._template_index.pages:
+            if entry.keypath in changed or \
+                    entry.keypath.removesuffix(".index") in changed:
+                outputs.add(entry.output)
+        return outputs
+
+    def _fingerprint_content(self) -> t.Optional[dict[str, str]]:
+        index = self.content_loader.index
+        return index.fingerprints() if index is not None else None
+
+    def _template_dependencies(self) -> dict[str, set[str]]:
+        template_dir = Path(self.template_folder)
+        graph = {}
+        for name in self._template_index.templates:
+            try:
+                mtime = (template_dir / name).stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            cached = self._template_deps.get(name)
+            if cached is None or cached[0] != mtime:
+                try:
+                    source = (template_dir / name).read_text(encoding="utf-8")
+                    deps = set(
+                        find_template_dependencies(self.jinja_env, source))
+                except (UnicodeDecodeError, TemplateSyntaxError):
+                    deps = set()
+                cached = self._template_deps[name] = (mtime, deps)
+            graph[name] = cached[1]
+        return graph
+
+    def pages_using_templates(
+            self, paths: t.Iterable[t.Union[str, os.PathLike]]) -> set[str]:
+        affected = {self._template_name(p) for p in paths}
+        if len(affected) == 0:
+            return set()
+        graph = self._template_dependencies()
+        changed = True
+        while changed:
+            changed = False
+            for name, deps in graph.items():
+                if name not in affected and (DYNAMIC_DEPENDENCY in deps
+                                             or not affected.isdisjoint(deps)):
+                    affected.add(name)
+                    changed = True
+        return {
+            entry.output
+            for entry in self._template_index.pages
+            if entry.template in affected
+        }
+
+    def page_for_url(self, url: str) -> t.Optional[str]:
+        entry = self._template_index.lookup(url)
+        return entry.output if entry is not None else None
+
+    def create_jinja_environment(self):
+        env = super().create_jinja_environment()
+        env.asset_prefix = self.static_url_path
+        return env
+
+    def static_url(self, path: t.Union[str, os.PathLike]) -> str:
+        static_dir = Path(self.static_folder).resolve()
+        rel = Path(path).resolve().relative_to(static_dir).as_posix()
+        return f"{self.static_url_path}/{rel}"
+
+    def clear_response_cache(self):
+        self._page_cache.clear()
+        self._gzip_cache.clear()
+
+    def _serve_page(self, url_path: str = ""):
+        entry = self._template_index.lookup(url_path)
+        if entry is None:
+            abort(404)
+        return self._render_page(entry)
+
+    def _render_page(self, entry: PageEntry):
+        cached = self._page_cache.get(entry.output)
+        if cached is None:
+            body = render_template(entry.template, **self._page_context(entry))
+            data = body.encode("utf-8")
+            cached = (data, hash_bytes(data)[:32])
+            if self._project_config.dev.page_cache:
+                self._page_cache[entry.output] = cached
+        data, etag = cached
+        mimetype = mimetypes.guess_type(entry.output)[0] or "text/html"
+        response = Response(data, mimetype=mimetype)
+        response.set_etag(etag)
+        return response
+
+    def _is_compressible(self, response: Response):
+        mimetype = response.mimetype or ""
+        return mimetype.startswith("text/") or mimetype in GZIP_MIMETYPES
+
+    def _compress_response(self, response: Response):
+        if response.status_code != 200 or not self._is_compressible(
+                response) or "Content-Encoding" in response.headers:
+            return response
+        response.vary.add("Accept-Encoding")
+        etag, weak = response.get_etag()
+        if etag is None or "gzip" not in request.headers.get(
+                "Accept-Encoding", ""):
+            return response
+        compressed = self._gzip_cache.get(etag)
+        if compressed is None:
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < GZIP_MIN_SIZE:
+                return response
+            compressed = gzip.compress(data, mtime=0)
+            self._gzip_cache[etag] = compressed
+        response.direct_passthrough = False
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(f"{etag}-gzip", weak=weak)
+        return response
+
+    def _finalize_response(self, response: Response):
+        if self._project_config.dev.gzip:
+            response = self._compress_response(response)
+        response.headers.setdefault("Cache-Control", "no-cache")
+        return response.make_conditional(request)
+
+    def _page_context(self, entry: PageEntry):
+        context = self.content_loader[entry.keypath] or {}
+        return {**context, "SITEGEN_ENV": "dev"}
+
     def derive_routes_from_dir(self):
-        for path in Path(self.template_folder).iterdir():
-            if path.is_dir():
-                self.derive_routes_from_dir()
-            elif path.as_posix().endswith(
-                    ".html.jinja") and not path.stem.startswith("_"):
-                url_path = "/" if path.stem.startswith(
-                    "index.") else f"/{path.stem.split('.')[0]}"
-                context = self.content_loader.url_indexer.get(url_path, {})
-                context["SITEGEN_ENV"] = "dev"
-                self.add_url_rule(
-                    url_path,
-                    endpoint=url_path,
-                    view_func=self._create_view_func(
-                        url_path.replace("/", "_"),
-                        path.relative_to(self.template_folder).as_posix(),
-                        **context,
-                    ),
-                )
-                self.info(f"Added route '{url_path}' -> '{path}'")
-                self._logger.debug(f"route '{url_path}' context: {context}")
+        self._template_index = TemplateIndex(
+            Path(self.template_folder), self._project_config.router.routes)
+        self.clear_response_cache()
+        if "page" not in self.view_functions:
+            self.add_url_rule("/",
+                              endpoint="page",
+                              view_func=self._serve_page,
+                              defaults={"url_path": ""})
+            self.add_url_rule("/<path:url_path>",
+                              endpoint="page",
+                              view_func=self._serve_page)
+        for entry in self._template_index.pages:
+            self._logger.debug(f"Route '{entry.url}' -> '{entry.template}'")
+        self.info(f"Indexed {len(self._template_index)} routes")
 
     def _set_jinja_callback(self, overrides: ConfigOverrider):
 
@@ -236,18 +593,3 @@ class DevServer(Flask, LoggerMixin):
         sys.path.insert(1, self._project_root.as_posix())
         mod = importlib.import_module("overrides")
         self._set_jinja_callback(mod.sitegen_overrides(ConfigOverrider()))
-
-    @staticmethod
-    def _create_view_func(prefix, path: str, **context):
-
-        def view_func():
-            return render_template(path, **context)
-
-        fn = FunctionType(
-            view_func.__code__,
-            view_func.__globals__,
-            f"{prefix}_view_func",
-            view_func.__defaults__,
-            view_func.__closure__,
-        )
-        return fn
@@ -0,0 +1,146 @@
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+import typing as t
+
+from .config import Config
+from .utils import LoggerMixin
+
+DEFAULT_IGNORES = ["__pycache__", "*.py[cod]", "*~", "*.swp", "*.swx", "4913"]
+CHANGE_KINDS = ("config", "template", "content", "static")
+
+
+class PathClassifier(object):
+
+    def __init__(self, project_root: Path, config: Config):
+        self._root = Path(project_root).resolve()
+        general = config.general
+        self._config_files = {
+            self._root / "config.toml", self._root / "overrides.py"
+        }
+        self._ignored_dirs = [
+            (self._root / general.output_dir).resolve(),
+            (self._root / general.cache_dir).resolve(),
+        ]
+        self._ignore_globs = DEFAULT_IGNORES + list(config.dev.ignore)
+        self._dirs = [
+            ("template", (self._root / general.template_dir).resolve()),
+            ("static", (self._root / general.static_dir).resolve()),
+        ]
+        if isinstance(general.content, str):
+            self._dirs.append(
+                ("content", (self._root / general.content).resolve()))
+
+    @staticmethod
+    def _is_within(path: Path, directory: Path):
+        return path == directory or directory in path.parents
+
+    def is_ignored(self, path: Path) -> bool:
+        if any(self._is_within(path, d) for d in self._ignored_dirs):
+            return True
+        try:
+            rel = path.relative_to(self._root)
+        except ValueError:
+            return True
+        for part in rel.parts:
+            if part.startswith("."):
+                return True
+            if any(fnmatch(part, pattern) for pattern in self._ignore_globs):
+                return True
+        rel_posix = rel.as_posix()
+        return any(
+            fnmatch(rel_posix, pattern) for pattern in self._ignore_globs)
+
+    def classify(self, path: t.Union[str, Path]) -> t.Optional[str]:
+        path = Path(path).resolve()
+        if self.is_ignored(path):
+            return None
+        if path in self._config_files:
+            return "config"
+        for kind, directory in self._dirs:
+            if self._is_within(path, directory):
+                return kind
+        return None
+
+
+class ChangeBatch(object):
+
+    def __init__(self):
+        self.raw_events = 0
+        self.paths: dict[str, set[str]] = {}
+        for kind in CHANGE_KINDS:
+            self.paths[kind] = set()
+
+    def add(self, kind: str, path: str):
+        self.paths[kind].add(path)
+
+    def __contains__(self, kind: str):
+        return len(self.paths[kind]) > 0
+
+    def __len__(self):
+        return sum(len(paths) for paths in self.paths.values())
+
+    @property
+    def kinds(self) -> list[str]:
+        return [kind for kind in CHANGE_KINDS if kind in self]
+
+    def summary(self) -> str:
+        return ", ".join(f"{len(self.paths[kind])} {kind}"
+                         for kind in self.kinds)
+
+
+class EventPipeline(LoggerMixin):
+
+    def __init__(self,
+                 classifier: PathClassifier,
+                 callback: t.Callable[[ChangeBatch], None],
+                 debounce: float = 0.2):
+        super().__init__(name="sitegen:EventPipeline")
+        self._classifier = classifier
+        self._callback = callback
+        self._debounce = debounce
+        self._lock = threading.Lock()
+        self._callback_lock = threading.Lock()
+        self._batch = ChangeBatch()
+        self._dropped = 0
+        self._timer: t.Optional[threading.Timer] = None
+
+    def push(self, event):
+        if event.is_directory:
+            return
+        paths = [event.src_path]
+        if getattr(event, "dest_path", None):
+            paths.append(event.dest_path)
+        with self._lock:
+            for path in paths:
+                kind = self._classifier.classify(path)
+                if kind is None:
+                    self._dropped += 1
+                    continue
+                self._batch.raw_events += 1
+                self._batch.add(kind, path)
+            if len(self._batch) == 0:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        # events arriving during a slow callback are batched for the next one
+        with self._callback_lock:
+            with self._lock:
+                batch, self._batch = self._batch, ChangeBatch()
+                dropped, self._dropped = self._dropped, 0
+                self._timer = None
+            if len(batch) == 0:
+                return
+            self.debug(f"Dropped {dropped} ignored file events")
+            self._callback(batch)
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
@@ -1,9 +1,13 @@
+import threading
+from collections import OrderedDict
 from jinja2.ext import Extension
 from mistune import HTMLRenderer, create_markdown
 from jinja2 import Environment, nodes
+from markupsafe import Markup
 from jinja2.parser import Parser
 
-from sitegen.utils import LoggerMixin
+from sitegen.profiling import get_profiler
+from sitegen.utils import LoggerMixin, hash_bytes
 
 
 class AutoRefreshListener(Extension, LoggerMixin):
@@ -16,24 +20,64 @@ class AutoRefreshListener(Extension, LoggerMixin):
     def parse(self, parser: Parser):
         lineno = next(parser.stream).lineno
         args = [parser.parse_expression()]
-        print(args)
         return nodes.CallBlock(self.call_method("_render_autorefresh", args),
                                [], [], []).set_lineno(lineno)
 
     def _render_autorefresh(self, port, caller):
-        return f"""
+        return Markup(f"""
         <script>
-            var socket = new WebSocket("ws://localhost:{port}");
-            socket.onmessage = function(event) {{
-                console.log(event.data);
-                if (event.data == "RELOAD") {{
-                    location.reload();
-                }}
-            }}
-            socket.onopen = (() => socket.send("REIGSTER"));
-        
+            (function() {{
+                var host = location.hostname || "localhost";
+                var socket = new WebSocket("ws://" + host + ":{port}");
+                socket.onopen = function() {{
+                    socket.send(JSON.stringify({{
+                        type: "register",
+                        path: location.pathname
+                    }}));
+                }};
+                socket.onmessage = function(event) {{
+                    if (event.data == "RELOAD") {{
+                        location.reload();
+                        return;
+                    }}
+                    var message = JSON.parse(event.data);
+                    if (message.type == "reload") {{
+                        location.reload();
+                    }} else if (message.type == "stylesheets") {{
+                        var links = document.querySelectorAll(
+                            'link[rel="stylesheet"]');
+                        links.forEach(function(link) {{
+                            var url = new URL(link.href, location.href);
+                            if (message.paths.indexOf(url.pathname) >= 0) {{
+                                url.searchParams.set("sitegen", Date.now());
+                                link.href = url.toString();
+                            }}
+                        }});
+                    }}
+                }};
+            }})();
         </script>
-        """
+        """)
+
+
+class AssetResolver(Extension, LoggerMixin):
+
+    def __init__(self, environment: Environment):
+        super().__init__(environment)
+        LoggerMixin.__init__(self, name="sitegen:AssetResolver")
+        environment.extend(asset_prefix="/static", asset_urls={})
+        environment.globals["asset"] = self._resolve_asset
+        environment.filters["asset"] = self._resolve_asset
+
+    def _resolve_asset(self, path: str) -> str:
+        rel = str(path).lstrip("/")
+        prefix = self.environment.asset_prefix.rstrip("/")
+        resolved = self.environment.asset_urls.get(rel)
+        if resolved is None:
+            if len(self.environment.asset_urls) > 0:
+                self.warning(f"No fingerprinted asset for '{rel}'")
+            resolved = rel
+        return f"{prefix}/{resolved}"
 
 
 class MarkdownRender(Extension, LoggerMixin):
@@ -42,7 +86,13 @@ class MarkdownRender(Extension, LoggerMixin):
     def __init__(self, environment: Environment):
         super().__init__(environment)
         LoggerMixin.__init__(self, name="sitegen:MarkdownRender")
-        environment.extend(markdown_render=HTMLRenderer)
+        environment.extend(markdown_render=HTMLRenderer,
+                           markdown_cache_size=1024)
+        self._parsers = {}
+        self._html_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
     def parse(self, parser: Parser):
         lineno = next(parser.stream).lineno
@@ -52,10 +102,53 @@ class MarkdownRender(Extension, LoggerMixin):
         return nodes.CallBlock(self.call_method("_render_markdown", []), [],
                                [], body).set_lineno(lineno)
 
+    def _get_parser(self, renderer_cls):
+        markdown = self._parsers.get(renderer_cls)
+        if markdown is None:
+            self.debug(f"Creating markdown parser for {renderer_cls}")
+            markdown = create_markdown(renderer=renderer_cls())
+            self._parsers[renderer_cls] = markdown
+        return markdown
+
     def _render_markdown(self, caller):
-        renderer: HTMLRenderer = self.environment.markdown_render()
-        markdown = create_markdown(renderer=renderer)
+        renderer_cls = self.environment.markdown_render
+        body = caller().strip()
+        key = (renderer_cls, hash_bytes(body.encode("utf-8")))
+        profiler = get_profiler()
+        profiler.count("markdown_blocks")
+        with self._cache_lock:
+            html = self._html_cache.get(key)
+            if html is not None:
+                self.hits += 1
+                self._html_cache.move_to_end(key)
+            else:
+                self.misses += 1
+                markdown = self._get_parser(renderer_cls)
+        if html is not None:
+            profiler.count("markdown_cache_hits")
+            return html
 
-        body = caller()
-        html = markdown(body.strip())
+        with profiler.span("markdown"):
+            html = markdown(body)
+        with self._cache_lock:
+            self._html_cache[key] = html
+            self._html_cache.move_to_end(key)
+            if len(self._html_cache) > self.environment.markdown_cache_size:
+                self._html_cache.popitem(last=False)
         return html
+
+    def cache_info(self):
+        with self._cache_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._html_cache),
+                "parsers": len(self._parsers),
+            }
+
+    @classmethod
+    def from_environment(cls, environment: Environment):
+        for ext in environment.extensions.values():
+            if isinstance(ext, cls):
+                return ext
+        return None
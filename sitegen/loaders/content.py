@@ -1,5 +1,6 @@
 import os
 from abc import ABCMeta, abstractmethod
+from bisect import bisect_left
 from pathlib import Path
 from typing import Any
 
@@ -7,6 +8,9 @@ from tomli import load
 
 from benedict import benedict
 
+from sitegen.loaders.index import ContentIndex
+from sitegen.loaders.snapshot import ContentSnapshot
+from sitegen.profiling import get_profiler
 from sitegen.utils import LoggerMixin
 
 
@@ -18,18 +22,137 @@ def get_dict_val_by_level(val: dict, path: str):
     return res
 
 
+def keypath_for_file(root: Path, p: Path):
+    suffixes = p.suffixes
+    full_path = p.relative_to(root).as_posix()
+    for suffix in suffixes:
+        full_path = full_path.removesuffix(suffix)
+    if full_path == ".":
+        full_path = "index"
+
+    return full_path.replace('/', '.')
+
+
+def scan_toml_files(root: Path) -> list[Path]:
+    files = []
+    stack = [root]
+    while len(stack) > 0:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    stack.append(Path(entry.path))
+                elif entry.is_file() and entry.name.endswith(".toml"):
+                    files.append(Path(entry.path))
+    return sorted(files, key=lambda p: p.relative_to(root).as_posix())
+
+
+def _parse_toml(path: Path) -> dict:
+    with open(path, 'rb') as f:
+        return load(f)
+
+
+class LazyContentTree(LoggerMixin):
+
+    def __init__(self, root: Path):
+        super().__init__(name="sitegen:LazyContentTree")
+        self._root = root
+        self._files: dict[str, Path] = {}
+        self._keys: list[str] = []
+        self._cache: dict[str, tuple[int, benedict]] = {}
+        self.scan()
+
+    def scan(self):
+        files = {}
+        for p in scan_toml_files(self._root):
+            keypath = keypath_for_file(self._root, p)
+            if keypath in files:
+                raise KeyError(f"Duplicate key {keypath}")
+            files[keypath] = p
+        self._files = files
+        self._keys = sorted(files)
+        self._cache = {k: v for k, v in self._cache.items() if k in files}
+        self.debug(f"Indexed {len(files)} content files in {self._root}")
+
+    def _load_file(self, keypath: str) -> benedict:
+        path = self._files[keypath]
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self.scan()
+            raise KeyError(keypath)
+        cached = self._cache.get(keypath)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        self.debug(f"Parsing {path} for {keypath}")
+        with get_profiler().span("toml_parse", file=path.as_posix()):
+            with open(path, 'rb') as f:
+                content = benedict(load(f))
+        self._cache[keypath] = (mtime, content)
+        return content
+
+    def _children(self, keypath: str) -> list[str]:
+        prefix = keypath + "."
+        children = []
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            children.append(self._keys[i])
+            i += 1
+        return children
+
+    def __getitem__(self, keypath: str):
+        children = self._children(keypath)
+        if keypath in self._files and len(children) == 0:
+            return self._load_file(keypath)
+        if keypath in self._files or len(children) > 0:
+            result = benedict()
+            if keypath in self._files:
+                result.update(self._load_file(keypath))
+            for child in children:
+                result[child[len(keypath) + 1:]] = self._load_file(child)
+            return result
+        parts = keypath.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            head = ".".join(parts[:i])
+            if head in self._files:
+                return self._load_file(head)[".".join(parts[i:])]
+        raise KeyError(keypath)
+
+    def __contains__(self, keypath: str):
+        try:
+            self[keypath]
+            return True
+        except KeyError:
+            return False
+
+    def get(self, keypath: str, default=None):
+        try:
+            return self[keypath]
+        except KeyError:
+            return default
+
+
 class _ContentUrlIndexer(object):
 
-    def __init__(self, data: benedict | None):
+    def __init__(self,
+                 data: benedict | None,
+                 index: ContentIndex | None = None):
         self._data = data
+        self._index = index
 
     def __getitem__(self, item: str):
+        if self._index is not None:
+            return self._index.lookup_url(item)
         path = self._convert_url_to_dotpath(item)
         res = self._data[path]
         res["__globals__"] = self._data.get("__globals__", {})
         return res
 
     def get(self, key, default=None):
+        if self._index is not None:
+            try:
+                return self._index.lookup_url(key)
+            except KeyError:
+                return default
         path = self._convert_url_to_dotpath(key)
         res = self._data.get(path, default)
         res["__globals__"] = self._data.get("__globals__", {})
@@ -46,6 +169,7 @@ class ContentLoader(metaclass=ABCMeta):
 
     def __init__(self, p: str | Path | Any):
         self._inner: benedict | None = None
+        self._index: ContentIndex | None = None
         self._content_cfg = p
         self._url_indexer = _ContentUrlIndexer(self._inner)
 
@@ -53,9 +177,32 @@ class ContentLoader(metaclass=ABCMeta):
     def load(self):
         raise NotImplementedError()
 
+    def _reindex(self):
+        if isinstance(self._inner, LazyContentTree):
+            self._index = None
+        else:
+            tree = self._inner
+            if isinstance(tree, benedict):
+                tree = tree.dict()
+            with get_profiler().span("content_index"):
+                self._index = ContentIndex(tree)
+        self._url_indexer = _ContentUrlIndexer(self._inner, self._index)
+
+    @property
+    def index(self) -> ContentIndex | None:
+        return self._index
+
     def __getitem__(self, item: str):
         result = None
 
+        if self._index is not None:
+            try:
+                return self._index.lookup(item)
+            except KeyError:
+                if item.endswith('.index'):
+                    raise
+                return None
+
         try:
             result = self._inner[item]
             result["__globals__"] = self._inner.get("__globals__", {})
@@ -76,47 +223,120 @@ class ContentLoader(metaclass=ABCMeta):
 
 class ContentPathLoader(ContentLoader, LoggerMixin):
 
-    def __init__(self, p):
+    PARALLEL_THRESHOLD = 64
+
+    def __init__(self,
+                 p,
+                 lazy: bool = False,
+                 workers: int = 1,
+                 snapshot_dir: Path | None = None):
         ContentLoader.__init__(self, p)
         LoggerMixin.__init__(self, "ContentDirLoader")
+        self._lazy = lazy
+        self._snapshot_dir = snapshot_dir
+        self._workers = workers if workers > 0 else os.cpu_count()
         self.load()
 
     def load(self):
         p = Path(self._content_cfg) if not isinstance(
             self._content_cfg, Path) else self._content_cfg
-        if p.is_file() and p.suffix == ".toml":
-            with open(p, 'rb') as f:
-                self._inner = benedict(load(f))
+        if self._lazy and p.is_dir():
+            self._inner = LazyContentTree(p)
+        elif p.is_file() and p.suffix == ".toml":
+            with get_profiler().span("toml_parse", file=p.as_posix()):
+                with open(p, 'rb') as f:
+                    self._inner = benedict(load(f))
         elif p.is_dir():
             self._recursive_load(p)
-        self._url_indexer = _ContentUrlIndexer(self._inner)
+        self._reindex()
+
+    def _parse_files(self, files: list[Path]) -> list[dict]:
+        if self._workers == 1 or len(files) < self.PARALLEL_THRESHOLD:
+            parsed = []
+            for p in files:
+                with get_profiler().span("toml_parse", file=p.as_posix()):
+                    parsed.append(_parse_toml(p))
+            return parsed
+        import multiprocess as mp
+        processes = min(self._workers, len(files))
+        self.debug(f"Parsing {len(files)} content files with "
+                   f"{processes} workers")
+        with get_profiler().span("toml_parse_parallel", files=len(files)):
+            with mp.Pool(processes=processes) as pool:
+                chunksize = max(1, len(files) // (processes * 4))
+                return pool.map(_parse_toml, files, chunksize=chunksize)
 
     def _recursive_load(self, path: Path):
-        queue = [path]
-        res = benedict()
-        while len(queue) > 0:
-            print(queue)
-            p = queue.pop()
-            content = None
-            if p.is_file() and p.name.endswith(".toml"):
-                with open(p, 'rb') as f:
-                    content = benedict(load(f))
-            elif p.is_dir():
-                queue.extend(list(p.iterdir()))
-            if content is not None:
-                suffixes = p.suffixes
-                full_path = p.relative_to(path).as_posix()
-                for suffix in suffixes:
-                    full_path = full_path.removesuffix(suffix)
-                if full_path == ".":
-                    full_path = "index"
-
-                full_path = full_path.replace('/', '.')
-                self.debug(f"Adding {full_path} to {content}")
-                if full_path in res:
+        files = scan_toml_files(path)
+        snapshot = None
+        if self._snapshot_dir is not None:
+            snapshot = ContentSnapshot(self._snapshot_dir, path).load()
+            removed = snapshot.retain(files)
+            if snapshot.tree is not None and not removed and all(
+                    snapshot.is_fresh(p) for p in files):
+                self.debug(f"Loaded content from {snapshot.path}")
+                self._inner = benedict(snapshot.tree)
+                if snapshot.dirty:
+                    snapshot.save(snapshot.tree)
+                return
+
+        parsed = [None] * len(files)
+        stale = []
+        for i, p in enumerate(files):
+            data = snapshot.lookup(p) if snapshot is not None else None
+            if data is None:
+                stale.append(i)
+            else:
+                parsed[i] = data
+        if snapshot is not None:
+            self.debug(f"Parsing {len(stale)} of {len(files)} content files")
+        stale_files = [files[i] for i in stale]
+        for i, data in zip(stale, self._parse_files(stale_files)):
+            parsed[i] = data
+            if snapshot is not None:
+                snapshot.record(files[i], data)
+
+        tree = self._merge_tree(path, files, parsed)
+        self._inner = benedict(tree)
+        if snapshot is not None:
+            snapshot.save(tree)
+
+    def _merge_tree(self, root: Path, files: list[Path],
+                    parsed: list[dict]) -> dict:
+        tree = {}
+        for p, content in zip(files, parsed):
+            full_path = keypath_for_file(root, p)
+            self.debug(f"Adding {full_path} from {p}")
+            parts = full_path.split('.')
+            node = tree
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+                if not isinstance(node, dict):
                     raise KeyError(f"Duplicate key {full_path}")
-                res[full_path] = content
-        self._inner = res
+            if parts[-1] in node:
+                raise KeyError(f"Duplicate key {full_path}")
+            node[parts[-1]] = content
+        return tree
+
+    def reload_file(self, path: Path):
+        root = Path(self._content_cfg).resolve()
+        path = Path(path).resolve()
+        if root.is_file() or not root.exists():
+            self.load()
+            return
+        if isinstance(self._inner, LazyContentTree):
+            self.debug(f"Rescanning content index for {path}")
+            self._inner.scan()
+            return
+        keypath = keypath_for_file(root, path)
+        if path.is_file():
+            self.debug(f"Reloading {keypath} from {path}")
+            with open(path, 'rb') as f:
+                self._inner[keypath] = benedict(load(f))
+        elif keypath in self._inner:
+            self.debug(f"Removing {keypath}")
+            del self._inner[keypath]
+        self._reindex()
 
 
 class ContentMappingLoader(ContentLoader):
@@ -129,7 +349,7 @@ class ContentMappingLoader(ContentLoader):
         for cfg in self._content_cfg:
             keypath = self.url_to_benedict_keypath(cfg.name)
             self._inner[keypath] = cfg.content
-        self._url_indexer = _ContentUrlIndexer(self._inner)
+        self._reindex()
 
     @staticmethod
     def url_to_benedict_keypath(key: str):
@@ -0,0 +1,92 @@
+from collections.abc import Mapping
+import typing as t
+
+from sitegen.manifest import hash_content
+
+GLOBALS_KEY = "__globals__"
+
+
+def normalize_keypath(keypath: str) -> str:
+    return keypath.strip('.')
+
+
+def normalize_url(url: str) -> str:
+    return url.strip('/')
+
+
+def keypath_to_url(keypath: str) -> str:
+    if keypath == "index":
+        return ""
+    return keypath.replace('.', '/')
+
+
+class PageContext(Mapping):
+    __slots__ = ("_data", "_globals")
+
+    def __init__(self, data: Mapping, globals_: Mapping):
+        self._data = data
+        self._globals = globals_
+
+    def __getitem__(self, key: str):
+        if key == GLOBALS_KEY:
+            return self._globals
+        return self._data[key]
+
+    def __iter__(self):
+        yield from (key for key in self._data if key != GLOBALS_KEY)
+        yield GLOBALS_KEY
+
+    def __len__(self):
+        return len(self._data) + (0 if GLOBALS_KEY in self._data else 1)
+
+    def __repr__(self):
+        return f"PageContext({dict(self._data)!r})"
+
+
+class ContentIndex(object):
+
+    def __init__(self, tree: t.Optional[Mapping]):
+        tree = tree if tree is not None else {}
+        self._globals = dict(tree.get(GLOBALS_KEY, {}))
+        self._by_keypath: dict[str, PageContext] = {}
+        self._by_url: dict[str, PageContext] = {}
+        self._compile(tree, "")
+
+    def _compile(self, node: Mapping, prefix: str):
+        for key, value in node.items():
+            if not isinstance(value, Mapping) or (prefix == ""
+                                                  and key == GLOBALS_KEY):
+                continue
+            keypath = f"{prefix}{key}"
+            context = PageContext(value, self._globals)
+            self._by_keypath[keypath] = context
+            self._by_url.setdefault(keypath_to_url(keypath), context)
+            self._compile(value, keypath + ".")
+
+    @property
+    def globals(self) -> Mapping:
+        return self._globals
+
+    def __len__(self):
+        return len(self._by_keypath)
+
+    def fingerprints(self) -> dict[str, str]:
+        hashes = {GLOBALS_KEY: hash_content(self._globals)}
+        for keypath, context in self._by_keypath.items():
+            hashes[keypath] = hash_content(context._data)
+        return hashes
+
+    def lookup(self, keypath: str) -> PageContext:
+        keypath = normalize_keypath(keypath)
+        context = self._by_keypath.get(keypath)
+        if context is None and keypath.endswith(".index"):
+            context = self._by_keypath.get(keypath.removesuffix(".index"))
+        if context is None:
+            raise KeyError(keypath)
+        return context
+
+    def lookup_url(self, url: str) -> PageContext:
+        context = self._by_url.get(normalize_url(url))
+        if context is None:
+            raise KeyError(url)
+        return context
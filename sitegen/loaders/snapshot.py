@@ -0,0 +1,101 @@
+import os
+import pickle
+from pathlib import Path
+import typing as t
+
+from sitegen.utils import LoggerMixin, hash_bytes, hash_file
+
+
+class ContentSnapshot(LoggerMixin):
+    VERSION = 1
+
+    def __init__(self, snapshot_dir: Path, content_root: Path):
+        super().__init__(name="sitegen:ContentSnapshot")
+        self._content_root = Path(content_root)
+        key = hash_bytes(self._content_root.resolve().as_posix().encode())
+        self._path = Path(snapshot_dir) / f"{key[:16]}.pickle"
+        self.files: dict[str, dict] = {}
+        self.tree: t.Optional[dict] = None
+        self._dirty = False
+
+    @property
+    def path(self):
+        return self._path
+
+    def load(self) -> "ContentSnapshot":
+        try:
+            with open(self._path, "rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return self
+        except Exception as e:
+            self.warning(f"Ignoring unreadable content snapshot: {e}")
+            return self
+        if data.get("version") != self.VERSION:
+            return self
+        self.files = data["files"]
+        self.tree = data["tree"]
+        return self
+
+    def save(self, tree: dict):
+        if not self._dirty and self.tree is not None:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_suffix(".tmp")
+        payload = {
+            "version": self.VERSION,
+            "files": self.files,
+            "tree": tree,
+        }
+        with open(tmp, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path)
+        self.tree = tree
+        self._dirty = False
+        self.debug(f"Saved content snapshot to {self._path}")
+
+    def _rel(self, path: Path) -> str:
+        return path.relative_to(self._content_root).as_posix()
+
+    def is_fresh(self, path: Path) -> bool:
+        entry = self.files.get(self._rel(path))
+        if entry is None:
+            return False
+        stat = path.stat()
+        if entry["size"] != stat.st_size:
+            return False
+        if entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if entry["hash"] == hash_file(path):
+            entry["mtime_ns"] = stat.st_mtime_ns
+            self._dirty = True
+            return True
+        return False
+
+    def lookup(self, path: Path) -> t.Optional[dict]:
+        if not self.is_fresh(path):
+            return None
+        return pickle.loads(self.files[self._rel(path)]["data"])
+
+    def record(self, path: Path, data: dict):
+        stat = path.stat()
+        self.files[self._rel(path)] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": hash_file(path),
+            "data": pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL),
+        }
+        self._dirty = True
+
+    def retain(self, paths: t.Iterable[Path]) -> bool:
+        current = {self._rel(p) for p in paths}
+        removed = set(self.files) - current
+        for rel in removed:
+            del self.files[rel]
+        if len(removed) > 0:
+            self._dirty = True
+        return len(removed) > 0
+
+    @property
+    def dirty(self):
+        return self._dirty
@@ -0,0 +1,102 @@
+import json
+from collections.abc import Mapping
+from pathlib import Path
+
+from jinja2 import Environment, meta
+
+from .utils import LoggerMixin, hash_bytes
+
+DYNAMIC_DEPENDENCY = "*"
+
+
+def _json_default(value):
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def hash_content(content) -> str:
+    payload = json.dumps(content, sort_keys=True, default=_json_default)
+    return hash_bytes(payload.encode("utf-8"))
+
+
+def find_template_dependencies(env: Environment, source: str) -> list[str]:
+    ast = env.parse(source)
+    deps = set()
+    for name in meta.find_referenced_templates(ast):
+        deps.add(name if name is not None else DYNAMIC_DEPENDENCY)
+    return sorted(deps)
+
+
+class BuildManifest(LoggerMixin):
+    FILENAME = ".sitegen-manifest.json"
+    VERSION = 4
+
+    def __init__(self, output_dir: Path):
+        super().__init__(name="sitegen:BuildManifest")
+        self._path = output_dir / self.FILENAME
+        self.templates: dict[str, dict] = {}
+        self.pages: dict[str, dict] = {}
+        self.static: dict[str, str] = {}
+        self.options: str | None = None
+
+    @property
+    def path(self):
+        return self._path
+
+    @classmethod
+    def load(cls, output_dir: Path) -> "BuildManifest":
+        manifest = cls(output_dir)
+        if not manifest.path.is_file():
+            manifest.debug(f"No build manifest found at {manifest.path}")
+            return manifest
+        try:
+            with open(manifest.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            manifest.warning(f"Ignoring unreadable build manifest: {e}")
+            return manifest
+        if data.get("version") != cls.VERSION:
+            manifest.info("Build manifest version changed, rebuilding all")
+            return manifest
+        manifest.templates = data.get("templates", {})
+        manifest.pages = data.get("pages", {})
+        manifest.static = data.get("static", {})
+        manifest.options = data.get("options")
+        return manifest
+
+    def save(self):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.VERSION,
+            "templates": self.templates,
+            "pages": self.pages,
+            "static": self.static,
+            "options": self.options,
+        }
+        payload = json.dumps(data, indent=2, sort_keys=True)
+        if self._path.is_file() and self._path.read_text() == payload:
+            return
+        self._path.write_text(payload)
+
+    def template_closure(self, name: str) -> set[str]:
+        seen = set()
+        stack = [name]
+        while len(stack) > 0:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            entry = self.templates.get(current)
+            if entry is not None:
+                stack.extend(entry["deps"])
+        return seen
+
+    def closure_hashes(self, name: str) -> dict[str, str] | None:
+        hashes = {}
+        for dep in self.template_closure(name):
+            entry = self.templates.get(dep)
+            if dep == DYNAMIC_DEPENDENCY or entry is None:
+                return None
+            hashes[dep] = entry["hash"]
+        return hashes
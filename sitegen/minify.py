@@ -0,0 +1,106 @@
+import re
+from pathlib import Path
+import typing as t
+
+_HTML_RAW_RE = re.compile(
+    r"(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)", re.I | re.S)
+_HTML_COMMENT_RE = re.compile(r"<!--(?!\[if|<!|>).*?-->", re.S)
+_SCRIPT_TYPE_RE = re.compile(r"""\btype\s*=\s*["']?([^"'\s>]+)""", re.I)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_STRING = r"""'(?:\\.|[^'\\\n])*'|"(?:\\.|[^"\\\n])*\""""
+_JS_TOKEN_RE = re.compile(
+    rf"""({_STRING}|`(?:\\.|[^`\\])*`)|(?<!\S)//[^\n]*|"""
+    r"""(?<!\S)/\*(?!!).*?\*/""", re.S)
+_CSS_TOKEN_RE = re.compile(
+    rf"""({_STRING})|/\*(?!!).*?\*/|\s*;\s*(?=}})|\s*([{{}};,>])\s*|(\s+)""",
+    re.S)
+_XML_TOKEN_RE = re.compile(r"(<!\[CDATA\[.*?\]\]>)|<!--.*?-->|>\s+(?=<)", re.S)
+
+JS_TYPES = {"text/javascript", "application/javascript", "module"}
+
+
+def _collapse_js(code: str) -> str:
+    return re.sub(r"[ \t]+", " ", re.sub(r"\s*\n\s*", "\n", code))
+
+
+def minify_js(text: str) -> str:
+    parts = []
+    code = []
+    last = 0
+    for match in _JS_TOKEN_RE.finditer(text):
+        code.append(text[last:match.start()])
+        if match.group(1) is not None:
+            parts.append(_collapse_js("".join(code)))
+            parts.append(match.group(1))
+            code = []
+        last = match.end()
+    code.append(text[last:])
+    parts.append(_collapse_js("".join(code)))
+    return "".join(parts).strip()
+
+
+def minify_css(text: str) -> str:
+
+    def replace(match: re.Match):
+        if match.group(1) is not None:
+            return match.group(1)
+        if match.group(2) is not None:
+            return match.group(2)
+        if match.group(3) is not None:
+            return " "
+        return ""
+
+    return _CSS_TOKEN_RE.sub(replace, text).strip()
+
+
+def minify_xml(text: str) -> str:
+
+    def replace(match: re.Match):
+        if match.group(1) is not None:
+            return match.group(1)
+        if match.group(0).startswith(">"):
+            return ">"
+        return ""
+
+    return _XML_TOKEN_RE.sub(replace, text).strip()
+
+
+def _minify_html_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", _HTML_COMMENT_RE.sub("", text))
+
+
+def _minify_raw_block(match: re.Match) -> str:
+    start, tag, body, end = match.groups()
+    tag = tag.lower()
+    if tag == "style":
+        body = minify_css(body)
+    elif tag == "script":
+        script_type = _SCRIPT_TYPE_RE.search(start)
+        if script_type is None or script_type.group(1).lower() in JS_TYPES:
+            body = minify_js(body)
+    return _WHITESPACE_RE.sub(" ", start) + body + end
+
+
+def minify_html(text: str) -> str:
+    parts = []
+    last = 0
+    for match in _HTML_RAW_RE.finditer(text):
+        parts.append(_minify_html_text(text[last:match.start()]))
+        parts.append(_minify_raw_block(match))
+        last = match.end()
+    parts.append(_minify_html_text(text[last:]))
+    return "".join(parts).strip()
+
+
+MINIFIERS: dict[str, t.Callable[[str], str]] = {
+    ".html": minify_html,
+    ".htm": minify_html,
+    ".xml": minify_xml,
+    ".css": minify_css,
+    ".js": minify_js,
+}
+
+
+def find_minifier(path: Path) -> t.Optional[t.Callable[[str], str]]:
+    return MINIFIERS.get(Path(path).suffix.lower())
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+import typing as t
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    wall: float = 0.0
+    cpu: float = 0.0
+    pid: int = 0
+    tid: int = 0
+    args: dict = field(default_factory=dict)
+
+
+class NullProfiler(object):
+    enabled = False
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        yield None
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+
+class BuildProfiler(NullProfiler):
+    enabled = True
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        span = Span(name=name,
+                    category=category,
+                    start=time.perf_counter(),
+                    pid=os.getpid(),
+                    tid=threading.get_ident(),
+                    args=args)
+        cpu_start = time.thread_time()
+        try:
+            yield span
+        finally:
+            span.wall = time.perf_counter() - span.start
+            span.cpu = time.thread_time() - cpu_start
+            with self._lock:
+                self.spans.append(span)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def merge(self, spans: list[Span], counters: dict):
+        with self._lock:
+            self.spans.extend(spans)
+            self.counters.update(counters)
+
+    def pages(self) -> list[Span]:
+        pages = [s for s in self.spans if s.category == "page"]
+        return sorted(pages, key=lambda s: s.wall, reverse=True)
+
+    def stage_totals(self) -> dict[str, dict[str, float]]:
+        totals = defaultdict(lambda: {"wall": 0.0, "cpu": 0.0, "calls": 0})
+        for span in self.spans:
+            if span.category == "page":
+                continue
+            totals[span.name]["wall"] += span.wall
+            totals[span.name]["cpu"] += span.cpu
+            totals[span.name]["calls"] += 1
+        return dict(sorted(totals.items(), key=lambda i: -i[1]["wall"]))
+
+    def write_chrome_trace(self, path: t.Union[str, Path]):
+        origin = min((s.start for s in self.spans), default=0.0)
+        events = []
+        for span in self.spans:
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start - origin) * 1e6,
+                "dur": span.wall * 1e6,
+                "pid": span.pid,
+                "tid": span.tid,
+                "args": dict(span.args, cpu_ms=span.cpu * 1e3),
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def print_report(self, top: int = 10):
+        from rich.console import Console
+        from rich.table import Table
+
+        console = Console()
+        stages = Table(title="Build stages")
+        for column in ("stage", "calls", "wall (ms)", "cpu (ms)"):
+            stages.add_column(column,
+                              justify="left" if column == "stage" else "right")
+        for name, total in self.stage_totals().items():
+            stages.add_row(name, str(total["calls"]),
+                           f"{total['wall'] * 1e3:.1f}",
+                           f"{total['cpu'] * 1e3:.1f}")
+        console.print(stages)
+
+        pages = Table(title=f"Top {top} slowest pages")
+        for column in ("page", "wall (ms)", "cpu (ms)", "markdown blocks",
+                       "bytes"):
+            pages.add_column(column,
+                             justify="left" if column == "page" else "right")
+        for span in self.pages()[:top]:
+            pages.add_row(span.name, f"{span.wall * 1e3:.1f}",
+                          f"{span.cpu * 1e3:.1f}",
+                          str(span.args.get("markdown_blocks", 0)),
+                          str(span.args.get("bytes", 0)))
+        console.print(pages)
+        console.print(", ".join(f"{name}: {value}"
+                                for name, value in self.counters.items()))
+
+
+_profiler: NullProfiler = NullProfiler()
+
+
+def get_profiler() -> NullProfiler:
+    return _profiler
+
+
+def set_profiler(profiler: t.Optional[NullProfiler]):
+    global _profiler
+    _profiler = profiler if profiler is not None else NullProfiler()
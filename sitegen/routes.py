@@ -0,0 +1,120 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+import typing as t
+
+from .config import Route
+from .loaders.index import normalize_url
+from .utils import LoggerMixin, build_keypath_from_relative_path
+
+
+@dataclass(frozen=True)
+class PageEntry:
+    template: str
+    output: str
+    url: str
+    keypath: str
+
+
+def url_for_output(output: str) -> str:
+    path = output.removesuffix(".html")
+    if path == "index":
+        return "/"
+    if path.endswith("/index"):
+        return "/" + path.removesuffix("index")
+    return "/" + path
+
+
+def output_for_url(url: str, template: str) -> str:
+    suffix = "".join(Path(template).suffixes).removesuffix(".jinja")
+    path = normalize_url(url)
+    if path == "":
+        path = "index"
+    elif url.endswith("/"):
+        path = f"{path}/index"
+    if path.endswith(suffix):
+        return path
+    return path + suffix
+
+
+def scan_templates(template_dir: Path) -> list[str]:
+    if not template_dir.is_dir():
+        return []
+    templates = []
+    stack = [(template_dir, "")]
+    while len(stack) > 0:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((Path(entry.path), f"{prefix}{entry.name}/"))
+                elif entry.is_file():
+                    templates.append(prefix + entry.name)
+    return sorted(templates)
+
+
+class TemplateIndex(LoggerMixin):
+
+    def __init__(self, template_dir: Path, routes: t.Iterable[Route] = ()):
+        super().__init__(name="sitegen:TemplateIndex")
+        self._template_dir = Path(template_dir)
+        self._routes = list(routes)
+        self.templates: list[str] = []
+        self.files: list[str] = []
+        self._template_set: set[str] = set()
+        self._pages: dict[str, PageEntry] = {}
+        self._by_url: dict[str, PageEntry] = {}
+        self.scan()
+
+    def scan(self):
+        templates = scan_templates(self._template_dir)
+        files = []
+        pages = {}
+        for name in templates:
+            basename = name.rsplit("/", 1)[-1]
+            if basename.startswith("_"):
+                continue
+            if basename.endswith(".jinja"):
+                output = name.removesuffix(".jinja")
+                pages[output] = self._entry(name, output,
+                                            url_for_output(output))
+            else:
+                files.append(name)
+        template_set = set(templates)
+        for route in self._routes:
+            if route.template not in template_set:
+                self.warning(f"Route '{route.path}' uses unknown template "
+                             f"'{route.template}'")
+                continue
+            output = output_for_url(route.path, route.template)
+            pages[output] = self._entry(route.template, output, route.path)
+        by_url = {}
+        for output in sorted(pages):
+            entry = pages[output]
+            by_url.setdefault(normalize_url(entry.url), entry)
+            by_url.setdefault(output, entry)
+        self.templates = templates
+        self.files = files
+        self._template_set = template_set
+        self._pages = pages
+        self._by_url = by_url
+        self.debug(f"Indexed {len(templates)} templates, {len(pages)} pages "
+                   f"in {self._template_dir}")
+
+    @staticmethod
+    def _entry(template: str, output: str, url: str) -> PageEntry:
+        keypath = build_keypath_from_relative_path(Path(output))
+        return PageEntry(template, output, url, keypath)
+
+    @property
+    def pages(self) -> list[PageEntry]:
+        return [self._pages[output] for output in sorted(self._pages)]
+
+    def has_template(self, name: str) -> bool:
+        return name in self._template_set
+
+    def lookup(self, url: str) -> t.Optional[PageEntry]:
+        return self._by_url.get(normalize_url(url))
+
+    def __len__(self):
+        return len(self._pages)
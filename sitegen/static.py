@@ -0,0 +1,124 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from shutil import copy2
+import typing as t
+
+from .utils import LoggerMixin, hash_file
+
+FICLONE = 0x40049409
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+
+@dataclass
+class SyncStats:
+    copied: int = 0
+    skipped: int = 0
+    removed: int = 0
+    bytes_copied: int = 0
+    bytes_skipped: int = 0
+    changed: dict[str, str] = field(default_factory=dict)
+
+
+def _reflink(src: Path, dst: Path):
+    import fcntl
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    os.utime(dst, ns=(os.stat(src).st_atime_ns, os.stat(src).st_mtime_ns))
+
+
+class StaticSync(LoggerMixin):
+
+    def __init__(self, link_mode: str = "copy", jobs: t.Optional[int] = None):
+        super().__init__(name="sitegen:StaticSync")
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Invalid link mode: {link_mode}, "
+                             f"expected one of {LINK_MODES}")
+        self._link_mode = link_mode
+        self._jobs = jobs
+
+    @staticmethod
+    def _is_unchanged(src: Path, dst: Path, src_stat: os.stat_result):
+        try:
+            dst_stat = dst.stat()
+        except FileNotFoundError:
+            return False
+        if dst_stat.st_size != src_stat.st_size:
+            return False
+        if dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+            return True
+        return hash_file(src) == hash_file(dst)
+
+    def _transfer(self, src: Path, dst: Path):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        if dst.exists() or dst.is_symlink():
+            dst.unlink()
+        if self._link_mode == "hardlink":
+            try:
+                os.link(src, dst)
+                return
+            except OSError as e:
+                self.debug(f"Hardlink failed for {src} ({e}), copying")
+        elif self._link_mode == "reflink":
+            try:
+                _reflink(src, dst)
+                return
+            except (OSError, ImportError) as e:
+                self.debug(f"Reflink failed for {src} ({e}), copying")
+                if dst.exists():
+                    dst.unlink()
+        copy2(src, dst)
+
+    def sync(self,
+             src: Path,
+             dst: Path,
+             aliases: t.Optional[t.Mapping[str, str]] = None) -> SyncStats:
+        stats = SyncStats()
+        src_files = {}
+        for dirpath, dirnames, filenames in os.walk(src):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = Path(dirpath) / name
+                src_files[path.relative_to(src).as_posix()] = path
+        for rel, alias in (aliases or {}).items():
+            if rel in src_files:
+                src_files[alias] = src_files[rel]
+
+        pending = []
+        for rel, path in src_files.items():
+            src_stat = path.stat()
+            if self._is_unchanged(path, dst / rel, src_stat):
+                stats.skipped += 1
+                stats.bytes_skipped += src_stat.st_size
+            else:
+                existed = (dst / rel).exists()
+                stats.changed[rel] = "modified" if existed else "added"
+                pending.append((path, dst / rel, src_stat.st_size))
+
+        if len(pending) > 0:
+            with ThreadPoolExecutor(max_workers=self._jobs) as pool:
+                futures = [
+                    pool.submit(self._transfer, path, target)
+                    for path, target, _ in pending
+                ]
+                for future in futures:
+                    future.result()
+            for path, target, size in pending:
+                self.debug(f"Copied {path} to {target}")
+                stats.copied += 1
+                stats.bytes_copied += size
+
+        if dst.is_dir():
+            for dirpath, dirnames, filenames in os.walk(dst, topdown=False):
+                for name in filenames:
+                    path = Path(dirpath) / name
+                    rel = path.relative_to(dst).as_posix()
+                    if rel not in src_files:
+                        self.debug(f"Removing orphaned {path}")
+                        path.unlink()
+                        stats.removed += 1
+                        stats.changed[rel] = "removed"
+                if Path(dirpath) != dst and not os.listdir(dirpath):
+                    os.rmdir(dirpath)
+        return stats
@@ -0,0 +1,76 @@
+from collections.abc import Mapping
+import typing as t
+
+from jinja2 import Template
+
+from .loaders.index import GLOBALS_KEY
+from .manifest import hash_content
+
+MISSING = "<missing>"
+
+
+class TrackingDict(dict):
+
+    def __init__(self, data: Mapping, accessed: set[str]):
+        super().__init__(data)
+        self._accessed = accessed
+
+    def __contains__(self, key):
+        self._accessed.add(key)
+        return super().__contains__(key)
+
+    def __getitem__(self, key):
+        self._accessed.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._accessed.add(key)
+        return super().get(key, default)
+
+    def __iter__(self):
+        self._accessed.update(self.keys())
+        return super().__iter__()
+
+
+class PageDependencies(object):
+
+    def __init__(self):
+        self.page: set[str] = set()
+
+    def to_dict(self) -> dict:
+        return {"page": sorted(self.page)}
+
+
+def _select(data: t.Optional[Mapping], keys: t.Iterable[str]) -> dict:
+    data = data if data is not None else {}
+    return {key: data[key] if key in data else MISSING for key in keys}
+
+
+def fingerprint(content: t.Optional[Mapping], deps: dict) -> str:
+    return hash_content(_select(content, deps["page"]))
+
+
+def render_tracked(
+        template: Template,
+        content: t.Optional[Mapping],
+        stream: bool = False) -> tuple[t.Iterable[str], PageDependencies]:
+    deps = PageDependencies()
+    data = {**template.globals, **(content if content is not None else {})}
+    if isinstance(data.get(GLOBALS_KEY), Mapping):
+        data[GLOBALS_KEY] = dict(data[GLOBALS_KEY])
+    data = TrackingDict(data, deps.page)
+    context = template.new_context(data, shared=True)
+    env = template.environment
+    if stream:
+
+        def generate():
+            try:
+                yield from template.root_render_func(context)
+            except Exception:
+                yield env.handle_exception()
+
+        return generate(), deps
+    try:
+        return [env.concat(template.root_render_func(context))], deps
+    except Exception:
+        env.handle_exception()
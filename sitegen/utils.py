@@ -1,3 +1,4 @@
+import hashlib
 import logging
 from functools import wraps
 from typing import Any, Concatenate, ParamSpec, TypeVar, Callable
@@ -56,3 +57,15 @@ def build_keypath_from_relative_path(path: Path):
 
     full_path = full_path.replace('/', '.')
     return full_path
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: Path, chunk_size=1 << 16) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
@@ -0,0 +1,79 @@
+import sys
+import threading
+from pathlib import Path
+import typing as t
+
+from watchdog.events import FileSystemEventHandler
+
+from .build import ProjectRenderer
+from .events import ChangeBatch, EventPipeline, PathClassifier
+from .utils import LoggerMixin
+
+if t.TYPE_CHECKING:
+    from .devserver import WebSocketNotifier
+
+
+class BuildWatcher(FileSystemEventHandler, LoggerMixin):
+
+    def __init__(self,
+                 project_root=Path("."),
+                 jobs: int = 1,
+                 build_overrides: dict | None = None,
+                 notifier: t.Optional["WebSocketNotifier"] = None):
+        super().__init__(name="sitegen:BuildWatcher")
+        self._project_root = Path(project_root)
+        self._jobs = jobs
+        self._build_overrides = build_overrides
+        self._notifier = notifier
+        self._lock = threading.Lock()
+        self._renderer = self._create_renderer()
+        self._renderer.build()
+        self._pipeline = self._create_pipeline()
+
+    def _create_renderer(self):
+        return ProjectRenderer(self._project_root,
+                               incremental=True,
+                               jobs=self._jobs,
+                               build_overrides=self._build_overrides)
+
+    def _create_pipeline(self):
+        config = self._renderer.config
+        return EventPipeline(
+            PathClassifier(self._project_root, config),
+            self._handle_batch,
+            debounce=config.dev.debounce,
+        )
+
+    def _handle_batch(self, batch: ChangeBatch):
+        self.info(f"Rebuilding after {batch.raw_events} file events "
+                  f"({batch.summary()})")
+        with self._lock:
+            try:
+                if "config" in batch:
+                    sys.modules.pop("overrides", None)
+                    self._renderer = self._create_renderer()
+                    stats = self._renderer.build(force=True)
+                    self._pipeline = self._create_pipeline()
+                else:
+                    stats = self._renderer.rebuild(batch)
+            except Exception as e:
+                self.error(f"Rebuild failed: {e}")
+                return
+        if self._notifier is not None and (stats.rebuilt + stats.copied +
+                                           stats.removed) > 0:
+            self._notifier.send_update_notification()
+
+    def terminate(self):
+        self._pipeline.cancel()
+
+    def on_moved(self, event):
+        self._pipeline.push(event)
+
+    def on_deleted(self, event):
+        self._pipeline.push(event)
+
+    def on_modified(self, event):
+        self._pipeline.push(event)
+
+    def on_created(self, event):
+        self._pipeline.push(event)
@@ -0,0 +1,302 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from shutil import copy2
+import typing as t
+
+from .minify import find_minifier
+from .utils import LoggerMixin, hash_bytes, hash_file
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@dataclass
+class OutputChanges:
+    added: set[str] = field(default_factory=set)
+    modified: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+
+    def record(self, rel: str, existed: bool):
+        self.removed.discard(rel)
+        if existed and rel not in self.added:
+            self.modified.add(rel)
+        else:
+            self.added.add(rel)
+
+    def remove(self, rel: str):
+        self.added.discard(rel)
+        self.modified.discard(rel)
+        self.removed.add(rel)
+
+    def merge(self, other: "OutputChanges"):
+        for rel in sorted(other.removed):
+            self.remove(rel)
+        for rel in sorted(other.added):
+            self.record(rel, existed=False)
+        for rel in sorted(other.modified):
+            self.record(rel, existed=True)
+
+    def to_dict(self) -> dict[str, list[str]]:
+        return {
+            "added": sorted(self.added),
+            "modified": sorted(self.modified),
+            "removed": sorted(self.removed),
+        }
+
+    def save(self, path: Path):
+        payload = json.dumps(self.to_dict(), indent=2) + "\n"
+        if path.is_file() and path.read_text() == payload:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(payload)
+
+    def __bool__(self):
+        return len(self.added) + len(self.modified) + len(self.removed) > 0
+
+
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+
+def _load_brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class _CompressedSibling:
+
+    def __init__(self, path: Path, f: t.BinaryIO, tmp: Path, brotli=None):
+        self.path = path
+        self.tmp = tmp
+        self._f = f
+        if brotli is None:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+            self._process, self._finish = compressor.compress, \
+                compressor.flush
+        else:
+            compressor = brotli.Compressor()
+            self._process, self._finish = compressor.process, \
+                compressor.finish
+
+    def write(self, data: bytes):
+        self._f.write(self._process(data))
+
+    def finish(self):
+        with self._f:
+            self._f.write(self._finish())
+
+    def discard(self):
+        self._f.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class OutputWriter(LoggerMixin):
+
+    def __init__(self,
+                 root: t.Optional[Path] = None,
+                 precompress: bool = False,
+                 minify: bool = False,
+                 jobs: t.Optional[int] = None,
+                 encoding: str = "utf-8"):
+        super().__init__(name="sitegen:OutputWriter")
+        self._root = root
+        self._precompress = precompress
+        self._minify = minify
+        self._jobs = jobs
+        self._encoding = encoding
+        self._brotli = _load_brotli() if precompress else None
+        self.compressed_suffixes: list[str] = []
+        if precompress:
+            self.compressed_suffixes.append(".gz")
+        if self._brotli is not None:
+            self.compressed_suffixes.append(".br")
+        self._pool: t.Optional[ThreadPoolExecutor] = None
+        self._pending: list[Future] = []
+        self._lock = threading.Lock()
+        self.changes = OutputChanges()
+
+    @staticmethod
+    def _open_temp(path: Path):
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.",
+                                   suffix=".tmp",
+                                   dir=path.parent)
+        os.chmod(tmp, 0o666 & ~_UMASK)
+        return os.fdopen(fd, "wb"), Path(tmp)
+
+    def _record(self, path: Path, existed: bool):
+        if self._root is None:
+            return
+        rel = path.relative_to(self._root).as_posix()
+        with self._lock:
+            self.changes.record(rel, existed)
+
+    def take_changes(self) -> OutputChanges:
+        self.wait()
+        changes, self.changes = self.changes, OutputChanges()
+        return changes
+
+    def _sibling_paths(self, path: Path) -> list[Path]:
+        return [
+            path.with_name(path.name + suffix)
+            for suffix in self.compressed_suffixes
+        ]
+
+    def _remove_stale_siblings(self, path: Path, produced: bool = True):
+        for suffix in COMPRESSED_SUFFIXES:
+            if produced and suffix in self.compressed_suffixes:
+                continue
+            sibling = path.with_name(path.name + suffix)
+            if sibling.is_file():
+                self.debug(f"Removing stale {sibling}")
+                sibling.unlink()
+                if self._root is not None:
+                    self.changes.remove(
+                        sibling.relative_to(self._root).as_posix())
+
+    def write(self, path: Path, chunks: t.Iterable[str]) -> int:
+        minifier = find_minifier(path) if self._minify else None
+        if minifier is not None:
+            data = minifier("".join(chunks)).encode(self._encoding)
+            return self.write_bytes(path, data)
+        return self._write_stream(path, chunks)
+
+    def _open_siblings(self, path: Path) -> list[_CompressedSibling]:
+        siblings = []
+        try:
+            for sibling in self._sibling_paths(path):
+                f, tmp = self._open_temp(sibling)
+                brotli = self._brotli if sibling.suffix == ".br" else None
+                siblings.append(_CompressedSibling(sibling, f, tmp, brotli))
+        except BaseException:
+            for sibling in siblings:
+                sibling.discard()
+            raise
+        return siblings
+
+    def _write_stream(self, path: Path, chunks: t.Iterable[str]) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f, tmp = self._open_temp(path)
+        siblings = []
+        written = 0
+        digest = hashlib.sha256()
+        try:
+            if self._precompress:
+                siblings = self._open_siblings(path)
+            with f:
+                for chunk in chunks:
+                    data = chunk.encode(self._encoding)
+                    f.write(data)
+                    for sibling in siblings:
+                        sibling.write(data)
+                    digest.update(data)
+                    written += len(data)
+            for sibling in siblings:
+                sibling.finish()
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            for sibling in siblings:
+                sibling.discard()
+            raise
+        if self._is_unchanged(path, written, digest.hexdigest()):
+            tmp.unlink()
+            for sibling in siblings:
+                sibling.discard()
+            self.debug(f"Output {path} unchanged, skipping write")
+        else:
+            existed = path.exists()
+            os.replace(tmp, path)
+            self._record(path, existed)
+            for sibling in siblings:
+                existed = sibling.path.exists()
+                os.replace(sibling.tmp, sibling.path)
+                self._record(sibling.path, existed)
+            self.debug(f"Wrote {written} bytes to {path}")
+        self._remove_stale_siblings(path)
+        return written
+
+    def _is_unchanged(self,
+                      path: Path,
+                      size: int,
+                      digest: str,
+                      siblings: bool = True) -> bool:
+        try:
+            if path.stat().st_size != size:
+                return False
+        except FileNotFoundError:
+            return False
+        if siblings and not all(p.is_file()
+                                for p in self._sibling_paths(path)):
+            return False
+        return hash_file(path) == digest
+
+    def _replace(self, path: Path, data: bytes):
+        existed = path.exists()
+        f, tmp = self._open_temp(path)
+        try:
+            with f:
+                f.write(data)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        os.replace(tmp, path)
+        self._record(path, existed)
+
+    def _compress(self, path: Path, data: bytes):
+        for sibling in self._sibling_paths(path):
+            if sibling.suffix == ".gz":
+                compressed = gzip.compress(data, mtime=0)
+            else:
+                compressed = self._brotli.compress(data)
+            self._replace(sibling, compressed)
+
+    def _submit(self, fn: t.Callable, *args):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self._jobs, thread_name_prefix="sitegen-compress")
+        self._pending.append(self._pool.submit(fn, *args))
+
+    def write_bytes(self,
+                    path: Path,
+                    data: bytes,
+                    precompress: bool = True) -> int:
+        precompress = precompress and self._precompress
+        if self._is_unchanged(path,
+                              len(data),
+                              hash_bytes(data),
+                              siblings=precompress):
+            self.debug(f"Output {path} unchanged, skipping write")
+            self._remove_stale_siblings(path, produced=precompress)
+            return len(data)
+        self._remove_stale_siblings(path, produced=precompress)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._replace(path, data)
+        if precompress:
+            self._submit(self._compress, path, data)
+        self.debug(f"Wrote {len(data)} bytes to {path}")
+        return len(data)
+
+    def copy_file(self, src: Path, dst: Path) -> bool:
+        if dst.is_file() and dst.stat().st_size == src.stat().st_size and \
+                hash_file(dst) == hash_file(src):
+            self.debug(f"Output {dst} unchanged, skipping copy")
+            return False
+        existed = dst.exists()
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        copy2(src, dst)
+        self._record(dst, existed)
+        return True
+
+    def wait(self):
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, Path(__file__).resolve().parent.parent.as_posix())
+
+
+@pytest.fixture
+def make_site(tmp_path):
+
+    def make(templates: dict[str, str],
+             content: str = "",
+             config: str = "",
+             static: dict[str, str] | None = None) -> Path:
+        root = tmp_path / "site"
+        (root / "templates").mkdir(parents=True, exist_ok=True)
+        for name, source in templates.items():
+            path = root / "templates" / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(source)
+        for name, data in (static or {}).items():
+            path = root / "static" / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(data)
+        (root / "content.toml").write_text(content)
+        (root / "config.toml").write_text('[general]\n'
+                                          'content = "content.toml"\n\n'
+                                          '[deploy]\n'
+                                          'branch = "gh-pages"\n\n' + config)
+        return root
+
+    yield make
+    sys.modules.pop("overrides", None)
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_cli(root: Path, *args: str, timeout: float = 120):
+    return subprocess.run(
+        [sys.executable, "cli.py", "-p",
+         root.as_posix(), *args],
+        cwd=ROOT,
+        capture_output=True,
+        timeout=timeout,
+        check=True)
+
+
+def test_parallel_build_with_parallel_content_parsing(make_site):
+    templates = {f"page_{i:03}.html.jinja": "{{ title }}" for i in range(70)}
+    root = make_site(templates)
+    config = (root / "config.toml").read_text().replace(
+        'content = "content.toml"',
+        'content = "content"\ncontent_workers = 4\ncontent_snapshot = false')
+    (root / "config.toml").write_text(config)
+    (root / "content").mkdir()
+    for i in range(70):
+        page = root / "content" / f"page_{i:03}.toml"
+        page.write_text(f'title = "Page {i}"\n')
+    run_cli(root, "build", "-j", "3")
+    for i in range(70):
+        output = root / "output" / f"page_{i:03}.html"
+        assert output.read_text() == f"Page {i}"
@@ -0,0 +1,17 @@
+import json
+
+from jinja2 import Environment
+
+from sitegen.loaders.index import GLOBALS_KEY, ContentIndex
+
+
+def test_globals_are_a_plain_dict():
+    index = ContentIndex({GLOBALS_KEY: {"site": "x"}, "index": {"a": 1}})
+    assert type(index.globals) is dict
+    assert index.lookup("index")[GLOBALS_KEY] is index.globals
+
+
+def test_globals_render_as_json():
+    index = ContentIndex({GLOBALS_KEY: {"site": "x"}, "index": {"a": 1}})
+    template = Environment().from_string("{{ __globals__ | tojson }}")
+    assert json.loads(template.render(index.lookup("index"))) == {"site": "x"}
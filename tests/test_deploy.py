@@ -0,0 +1,60 @@
+import subprocess
+
+import pytest
+
+from sitegen.deploy import GitDeployer, git_blob_hash
+
+
+@pytest.fixture
+def git_env(monkeypatch):
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "sitegen")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "sitegen@example.com")
+
+
+def git(repo, *args):
+    return subprocess.run(["git", *args],
+                          cwd=repo,
+                          capture_output=True,
+                          check=True).stdout.decode().strip()
+
+
+def count_objects(repo):
+    return len(
+        git(repo, "cat-file", "--batch-all-objects",
+            "--batch-check").splitlines())
+
+
+def test_deploy_reuses_unchanged_blobs(tmp_path, git_env):
+    repo = tmp_path / "repo.git"
+    git(tmp_path, "init", "-q", "--bare", repo.as_posix())
+    output = tmp_path / "output"
+    (output / "css").mkdir(parents=True)
+    (output / "index.html").write_text("<p>index</p>")
+    (output / "css" / "site.css").write_text("p{}")
+    (output / ".sitegen-manifest.json").write_text("{}")
+    deployer = GitDeployer(output,
+                           repo,
+                           "gh-pages",
+                           cache_path=tmp_path / "deploy.json")
+
+    first = deployer.deploy()
+    assert first.changed and first.files == 2 and first.written == 2
+    assert git(repo, "ls-tree", "-r", "--name-only",
+               "gh-pages").splitlines() == ["css/site.css", "index.html"]
+
+    objects = count_objects(repo)
+    second = deployer.deploy()
+    assert not second.changed
+    assert second.commit == first.commit
+    assert second.reused == 2 and second.written == 0
+    assert count_objects(repo) == objects
+
+    (output / "index.html").write_text("<p>changed</p>")
+    third = deployer.deploy()
+    assert third.changed and third.written == 1 and third.reused == 1
+    assert git(repo, "rev-parse", f"{third.commit}^") == first.commit
+    assert git(repo, "rev-parse", "gh-pages:index.html") == \
+        git_blob_hash(b"<p>changed</p>")
+    # one blob, one tree and one commit
+    assert count_objects(repo) == objects + 3
@@ -0,0 +1,40 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from sitegen.config import Config
+from sitegen.events import EventPipeline, PathClassifier
+
+
+def test_pipeline_serializes_slow_callbacks(make_site):
+    root = make_site({"index.html.jinja": "{{ title }}"})
+    config = Config.from_toml(root / "config.toml")
+    lock = threading.Lock()
+    running = []
+    batches = []
+    done = threading.Event()
+
+    def callback(batch):
+        with lock:
+            running.append(1)
+            concurrent = len(running)
+        time.sleep(0.6)
+        with lock:
+            running.pop()
+            batches.append((concurrent, batch.paths["template"]))
+            if len(batches) == 2:
+                done.set()
+
+    pipeline = EventPipeline(PathClassifier(root, config),
+                             callback,
+                             debounce=0.05)
+    for name in ("a", "b", "c"):
+        path = (root / "templates" / f"{name}.html.jinja").as_posix()
+        pipeline.push(SimpleNamespace(is_directory=False, src_path=path))
+        time.sleep(0.2)
+    assert done.wait(2)
+    time.sleep(0.2)
+
+    assert [concurrent for concurrent, _ in batches] == [1, 1]
+    assert len(batches) == 2
+    assert len(batches[1][1]) == 2
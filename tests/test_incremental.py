@@ -0,0 +1,100 @@
+import sys
+
+from sitegen.build import ProjectRenderer
+
+INDEX = ('{% extends "_base.html.jinja" %}{% block body %}'
+         '{% include "_nav.html.jinja" %}{{ title }}{% endblock %}')
+ABOUT = '{% extends "_base.html.jinja" %}{% block body %}{{ title }}' \
+    '{% endblock %}'
+TEMPLATES = {
+    "_base.html.jinja": "<main>{% block body %}{% endblock %}</main>",
+    "_nav.html.jinja": "<nav>home</nav>",
+    "index.html.jinja": INDEX,
+    "about.html.jinja": ABOUT,
+    "robots.txt": "User-agent: *",
+}
+CONTENT = '[index]\ntitle = "Home"\n[about]\ntitle = "About"\n'
+
+
+def build(root):
+    return ProjectRenderer(root, incremental=True).build()
+
+
+def test_incremental_build_follows_template_edges(make_site):
+    root = make_site(TEMPLATES, content=CONTENT)
+    templates = root / "templates"
+    output = root / "output"
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped, stats.copied) == (2, 0, 1)
+
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped, stats.unchanged) == (0, 2, 1)
+
+    (templates / "_nav.html.jinja").write_text("<nav>menu</nav>")
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped) == (1, 1)
+    assert (output / "index.html").read_text() == \
+        "<main><nav>menu</nav>Home</main>"
+
+    base = "<div>{% block body %}{% endblock %}</div>"
+    (templates / "_base.html.jinja").write_text(base)
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped) == (2, 0)
+    assert (output / "about.html").read_text() == "<div>About</div>"
+
+    (root / "content.toml").write_text(CONTENT.replace("About", "Us"))
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped) == (1, 1)
+    assert (output / "about.html").read_text() == "<div>Us</div>"
+
+
+def test_incremental_build_removes_stale_outputs(make_site):
+    root = make_site(TEMPLATES, content=CONTENT)
+    build(root)
+    (root / "templates" / "about.html.jinja").unlink()
+    (root / "templates" / "robots.txt").unlink()
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped, stats.removed) == (0, 1, 2)
+    assert not (root / "output" / "about.html").exists()
+    assert not (root / "output" / "robots.txt").exists()
+
+
+OVERRIDES = '''from mistune import HTMLRenderer
+
+
+class Renderer(HTMLRenderer):
+
+    def paragraph(self, text):
+        return '<p class="{cls}">' + text + '</p>'
+
+
+def sitegen_overrides(overrider):
+    overrider.set_markdown_render(Renderer)
+    return overrider
+'''
+
+
+def test_incremental_build_follows_overrides_and_config(make_site):
+    templates = dict(TEMPLATES)
+    templates["about.html.jinja"] = \
+        "{% markdown %}{{ title }}{% endmarkdown %}"
+    root = make_site(templates, content=CONTENT)
+    output = root / "output"
+    (root / "overrides.py").write_text(OVERRIDES.format(cls="a"))
+    build(root)
+    assert (output / "about.html").read_text() == '<p class="a">About</p>'
+
+    sys.modules.pop("overrides")
+    (root / "overrides.py").write_text(OVERRIDES.format(cls="lead"))
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped) == (2, 0)
+    assert (output / "about.html").read_text() == '<p class="lead">About</p>'
+
+    stats = build(root)
+    assert (stats.rebuilt, stats.skipped) == (0, 2)
+
+    with open(root / "config.toml", "a") as f:
+        f.write('[router]\nroutes = [{path = "/home", '
+                'template = "index.html.jinja"}]\n')
+    stats = build(root)
+    assert stats.skipped == 0
@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from jinja2 import Environment
+
+from sitegen.extensions.template import MarkdownRender
+
+
+def test_markdown_cache_is_thread_safe():
+    env = Environment(extensions=[MarkdownRender])
+    env.markdown_cache_size = 8
+    template = env.from_string("{% markdown %}# {{ n }}{% endmarkdown %}")
+    ext = MarkdownRender.from_environment(env)
+
+    def render(n):
+        return template.render(n=n % 16)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(render, range(2000)))
+
+    assert results[3] == "<h1>3</h1>\n"
+    info = ext.cache_info()
+    assert info["hits"] + info["misses"] == 2000
+    assert info["size"] <= 8
@@ -0,0 +1,113 @@
+import gzip
+import json
+from pathlib import Path
+
+from sitegen.build import ProjectRenderer
+from sitegen.minify import minify_css, minify_html, minify_js
+from sitegen.writer import OutputWriter
+
+PAGE = """<!DOCTYPE html>
+<html>
+  <!-- comment -->
+  <body>
+    <p>{{ title }}</p>
+    <pre>  keep  </pre>
+  </body>
+</html>
+"""
+
+
+def build(root, incremental=True, **overrides):
+    renderer = ProjectRenderer(root,
+                               incremental=incremental,
+                               build_overrides=overrides)
+    renderer.build()
+    return renderer
+
+
+def read_changes(root):
+    return json.loads((root / "output" / ".sitegen-changes.json").read_text())
+
+
+def test_minifiers_keep_strings_and_preformatted_text():
+    assert minify_html("<p>a\n   b</p>\n<pre> x\n  y</pre>") == \
+        "<p>a b</p> <pre> x\n  y</pre>"
+    assert minify_js('var a = "x // y";  // c\n\n  b();') == \
+        'var a = "x // y";\nb();'
+    assert minify_css('a > b {\n  content: "a ; b";\n}') == \
+        'a>b{content: "a ; b"}'
+
+
+def test_output_options_change_rebuilds_pages(make_site):
+    root = make_site({"index.html.jinja": PAGE},
+                     content='[index]\ntitle = "Hi"\n')
+    build(root)
+    index = root / "output" / "index.html"
+    assert "<!-- comment -->" in index.read_text()
+
+    renderer = build(root, minify=True, precompress=True)
+    assert renderer.stats.rebuilt == 1
+    assert "<!-- comment -->" not in index.read_text()
+    assert gzip.decompress((root / "output" /
+                            "index.html.gz").read_bytes()) == \
+        index.read_bytes()
+
+    renderer = build(root, minify=True, precompress=True)
+    assert renderer.stats.rebuilt == 0
+
+
+def test_streamed_pages_compress_in_the_same_pass(tmp_path, monkeypatch):
+
+    def read_bytes(path):
+        raise AssertionError(f"{path} read back after writing")
+
+    monkeypatch.setattr(Path, "read_bytes", read_bytes)
+    writer = OutputWriter(tmp_path, precompress=True)
+    chunks = [f"<p>{i}</p>\n" for i in range(5000)]
+    written = writer.write(tmp_path / "index.html", iter(chunks))
+    changes = writer.take_changes()
+    monkeypatch.undo()
+
+    page = "".join(chunks).encode()
+    assert written == len(page)
+    assert gzip.decompress((tmp_path / "index.html.gz").read_bytes()) == page
+    assert changes.added == {"index.html", "index.html.gz"}
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ["index.html", "index.html.gz"]
+
+
+def test_disabling_precompress_removes_siblings(make_site):
+    root = make_site({"index.html.jinja": PAGE},
+                     content='[index]\ntitle = "Hi"\n')
+    build(root, precompress=True)
+    index = root / "output" / "index.html"
+    assert gzip.decompress((root / "output" /
+                            "index.html.gz").read_bytes()) == \
+        index.read_bytes()
+
+    build(root)
+    assert not (root / "output" / "index.html.gz").exists()
+    assert read_changes(root)["removed"] == ["index.html.gz"]
+
+
+def test_disabling_precompress_on_full_build(make_site):
+    root = make_site({"index.html.jinja": PAGE},
+                     content='[index]\ntitle = "Hi"\n')
+    build(root, incremental=False, minify=True, precompress=True)
+    assert (root / "output" / "index.html.gz").is_file()
+    build(root, incremental=False, minify=True)
+    assert not (root / "output" / "index.html.gz").exists()
+
+
+def test_full_build_removes_deleted_pages(make_site):
+    templates = {"index.html.jinja": PAGE, "about.html.jinja": PAGE}
+    root = make_site(templates,
+                     content='[index]\ntitle = "Hi"\n[about]\ntitle = "A"\n')
+    build(root, incremental=False)
+    about = root / "output" / "about.html"
+    assert about.is_file()
+
+    (root / "templates" / "about.html.jinja").unlink()
+    build(root, incremental=False)
+    assert not about.exists()
+    assert read_changes(root)["removed"] == ["about.html"]
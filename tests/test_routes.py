@@ -0,0 +1,66 @@
+from sitegen.build import ProjectRenderer
+from sitegen.config import Route
+from sitegen.devserver import DevServer
+from sitegen.routes import TemplateIndex, output_for_url, url_for_output
+
+POST = '{% extends "_base.html.jinja" %}{% block body %}{{ title }}' \
+    '{% endblock %}'
+TEMPLATES = {
+    "_base.html.jinja": "<main>{% block body %}{% endblock %}</main>",
+    "index.html.jinja": "{{ title }}",
+    "blog/index.html.jinja": "{{ title }}",
+    "blog/post.html.jinja": POST,
+    "feed.xml": "<feed/>",
+}
+OVERRIDES = "def sitegen_overrides(overrider):\n    return overrider\n"
+CONTENT = ('[index]\ntitle = "Home"\n[blog.index]\ntitle = "Blog"\n'
+           '[blog.post]\ntitle = "Post"\n[home]\ntitle = "Start"\n')
+ROUTES = ('[router]\nroutes = [\n'
+          '  {path = "/home", template = "index.html.jinja"},\n'
+          '  {path = "/missing", template = "missing.html.jinja"},\n]\n')
+
+
+def test_template_index_maps_urls_to_templates(make_site):
+    root = make_site(TEMPLATES, content=CONTENT, config=ROUTES)
+    index = TemplateIndex(root / "templates", [
+        Route(path="/home", template="index.html.jinja"),
+        Route(path="/missing", template="missing.html.jinja"),
+    ])
+    assert index.templates == [
+        "_base.html.jinja", "blog/index.html.jinja", "blog/post.html.jinja",
+        "feed.xml", "index.html.jinja"
+    ]
+    assert index.files == ["feed.xml"]
+    assert [entry.output for entry in index.pages] == \
+        ["blog/index.html", "blog/post.html", "home.html", "index.html"]
+
+    post = index.lookup("/blog/post")
+    assert post.template == "blog/post.html.jinja"
+    assert post.keypath == "blog.post"
+    assert index.lookup("/blog/post.html") == post
+    assert index.lookup("/blog/").url == "/blog/"
+    assert index.lookup("/blog/").keypath == "blog.index"
+    assert index.lookup("/home").template == "index.html.jinja"
+    assert index.lookup("/missing") is None
+
+    assert url_for_output("blog/index.html") == "/blog/"
+    assert output_for_url("/blog/", "index.html.jinja") == "blog/index.html"
+
+
+def test_nested_templates_build_and_serve(make_site):
+    root = make_site(TEMPLATES, content=CONTENT, config=ROUTES)
+    ProjectRenderer(root).build()
+    output = root / "output"
+    assert (output / "blog" / "post.html").read_text() == "<main>Post</main>"
+    assert (output / "blog" / "index.html").read_text() == "Blog"
+    assert (output / "home.html").read_text() == "Start"
+    assert (output / "feed.xml").read_text() == "<feed/>"
+    assert not (output / "missing.html").exists()
+
+    (root / "overrides.py").write_text(OVERRIDES)
+    client = DevServer(__name__, project_root=root).test_client()
+    assert client.get("/blog/post").data == b"<main>Post</main>"
+    assert client.get("/blog/post.html").data == b"<main>Post</main>"
+    assert client.get("/blog/").data == b"Blog"
+    assert client.get("/home").data == b"Start"
+    assert client.get("/missing").status_code == 404
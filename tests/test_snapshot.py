@@ -0,0 +1,85 @@
+import pytest
+
+from sitegen.loaders import content
+from sitegen.loaders.content import ContentPathLoader
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    calls = []
+    parse_toml = content._parse_toml
+
+    def parse(path):
+        calls.append(path.name)
+        return parse_toml(path)
+
+    monkeypatch.setattr(content, "_parse_toml", parse)
+    return calls
+
+
+def write_content(root, files):
+    for name, source in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+
+
+def load(root, snapshot_dir):
+    return ContentPathLoader(root, snapshot_dir=snapshot_dir)
+
+
+def test_snapshot_serves_fresh_content(tmp_path, parsed):
+    root = tmp_path / "content"
+    write_content(root, {
+        "index.toml": 'title = "Home"\n',
+        "blog/post.toml": 'title = "Post"\n',
+    })
+    snapshot_dir = tmp_path / "snapshots"
+    assert load(root, snapshot_dir)["blog.post"]["title"] == "Post"
+    assert sorted(parsed) == ["index.toml", "post.toml"]
+
+    parsed.clear()
+    loader = load(root, snapshot_dir)
+    assert parsed == []
+    assert loader["index"]["title"] == "Home"
+    assert loader["blog.post"]["title"] == "Post"
+
+
+def test_snapshot_reparses_changed_and_drops_removed_files(tmp_path, parsed):
+    root = tmp_path / "content"
+    write_content(
+        root, {
+            "index.toml": 'title = "Home"\n',
+            "about.toml": 'title = "About"\n',
+            "blog/post.toml": 'title = "Post"\n',
+        })
+    snapshot_dir = tmp_path / "snapshots"
+    load(root, snapshot_dir)
+
+    parsed.clear()
+    write_content(root, {"about.toml": 'title = "About us"\n'})
+    loader = load(root, snapshot_dir)
+    assert parsed == ["about.toml"]
+    assert loader["about"]["title"] == "About us"
+    assert loader["blog.post"]["title"] == "Post"
+
+    parsed.clear()
+    (root / "blog" / "post.toml").unlink()
+    loader = load(root, snapshot_dir)
+    assert parsed == []
+    assert loader["about"]["title"] == "About us"
+    assert loader["blog.post"] is None
+
+    parsed.clear()
+    loader = load(root, snapshot_dir)
+    assert parsed == []
+    assert loader["blog.post"] is None
+
+
+def test_snapshot_keeps_key_check(tmp_path):
+    root = tmp_path / "content"
+    write_content(root, {"index.toml": '"b.c" = 1\n'})
+    snapshot_dir = tmp_path / "snapshots"
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            load(root, snapshot_dir)
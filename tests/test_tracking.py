@@ -0,0 +1,79 @@
+import json
+
+import pytest
+from jinja2 import Environment, UndefinedError
+
+from sitegen.build import ProjectRenderer
+from sitegen.loaders.index import GLOBALS_KEY
+from sitegen.tracking import fingerprint, render_tracked
+
+CONTENT = {GLOBALS_KEY: {"site": "x"}, "title": "t", "photo": {"url": "u"}}
+
+
+def render(source: str, content=CONTENT):
+    template = Environment().from_string(source)
+    chunks, deps = render_tracked(template, content)
+    return "".join(chunks), deps.to_dict()
+
+
+def test_records_accessed_keys():
+    output, deps = render("{{ title }}{{ range(1) | list }}")
+    assert output == "t[0]"
+    assert "title" in deps["page"]
+    assert "photo" not in deps["page"]
+
+
+def test_runtime_errors_are_not_masked():
+    with pytest.raises(UndefinedError):
+        render("{{ photo.url.foo.bar }}")
+
+
+def test_globals_render_as_plain_dict():
+    output, deps = render("{{ __globals__ }}")
+    assert output == "{'site': 'x'}"
+    assert GLOBALS_KEY in deps["page"]
+
+
+def test_globals_render_as_json():
+    output, _ = render("{{ __globals__ | tojson }}")
+    assert json.loads(output) == {"site": "x"}
+
+
+def test_fingerprint_ignores_unused_keys():
+    _, deps = render("{{ title }}")
+    changed = {**CONTENT, "photo": {"url": "v"}}
+    assert fingerprint(CONTENT, deps) == fingerprint(changed, deps)
+    changed = {**CONTENT, "title": "other"}
+    assert fingerprint(CONTENT, deps) != fingerprint(changed, deps)
+
+
+def test_fingerprint_tracks_whole_globals():
+    _, deps = render("{{ __globals__.site }}")
+    changed = {**CONTENT, GLOBALS_KEY: {"site": "x", "other": 1}}
+    assert fingerprint(CONTENT, deps) != fingerprint(changed, deps)
+
+
+def test_build_renders_globals_as_json(make_site):
+    root = make_site({"index.html.jinja": "{{ __globals__ | tojson }}"},
+                     content='[__globals__]\nsite = "x"\n\n[index]\na = 1\n')
+    ProjectRenderer(root).build()
+    output = (root / "output" / "index.html").read_text()
+    assert json.loads(output.replace("&#34;", '"')) == {"site": "x"}
+
+
+def test_incremental_skips_pages_with_unchanged_dependencies(make_site):
+    root = make_site(
+        {
+            "a.html.jinja": "{{ title }}",
+            "b.html.jinja": "{{ __globals__.site }}",
+        },
+        content='[__globals__]\nsite = "x"\n\n'
+        '[a]\ntitle = "A"\nunused = 1\n\n[b]\ntitle = "B"\n')
+    ProjectRenderer(root, incremental=True).build()
+    content = (root / "content.toml").read_text()
+    content = content.replace("unused = 1", "unused = 2")
+    (root / "content.toml").write_text(
+        content.replace('site = "x"', 'site = "y"'))
+    stats = ProjectRenderer(root, incremental=True).build()
+    assert (stats.rebuilt, stats.skipped) == (1, 1)
+    assert (root / "output" / "b.html").read_text() == "y"